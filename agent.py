@@ -8,14 +8,17 @@ Usage:
     python agent.py --repo /path/to/repo --prompt "fix the authentication bug"
 """
 import argparse
+import asyncio
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
-from config import TOP_K_CHUNKS
-from embed import VectorStore, index_repository
+from config import LLM_FALLBACK_PROVIDER, RESPONSE_CACHE_ENABLED, TOP_K_CHUNKS
+from embed import VectorStore, index_repository, update_repository
+from ingest import CodeChunk
 from retrieve import CodeRetriever
-from llm import LLM
+from llm import LLM, get_llm_provider
+from llm_cache import LLMCache
 
 
 class CodingAgent:
@@ -27,12 +30,16 @@ class CodingAgent:
         self,
         repo_path: Optional[str] = None,
         index_name: str = "default",
-        llm_provider: Optional[str] = None
+        llm_provider: Optional[str] = None,
+        use_cache: bool = RESPONSE_CACHE_ENABLED
     ):
         self.repo_path = repo_path
         self.index_name = index_name
         self.retriever = CodeRetriever()
-        self.llm = LLM()
+        # Semantic cache hits compare user requests with the retrieval embedding model
+        cache = LLMCache(embed_fn=lambda text: self.retriever.store.embed_query(text)) if use_cache else None
+        fallback = get_llm_provider(LLM_FALLBACK_PROVIDER) if LLM_FALLBACK_PROVIDER else None
+        self.llm = LLM(get_llm_provider(llm_provider), cache=cache, fallback_provider=fallback)
         self.indexed = False
         
     def index(self, force: bool = False) -> bool:
@@ -69,6 +76,26 @@ class CodingAgent:
             print(f"❌ Indexing failed: {e}")
             return False
     
+    def update(self) -> bool:
+        """
+        Incrementally re-index files that changed since the last index.
+        
+        Returns:
+            True if the update was successful
+        """
+        if not self.repo_path:
+            print("❌ No repository path specified")
+            return False
+        
+        try:
+            store = update_repository(self.repo_path, self.index_name)
+            self.retriever.store = store
+            self.indexed = True
+            return True
+        except Exception as e:
+            print(f"❌ Update failed: {e}")
+            return False
+    
     def query(self, prompt: str, top_k: int = TOP_K_CHUNKS) -> str:
         """
         Process a user query: retrieve relevant code and get LLM response.
@@ -84,27 +111,111 @@ class CodingAgent:
             if not self.index():
                 return "Error: Repository not indexed. Please index first."
         
+        context = self._retrieve_context(prompt, top_k)
+        
+        # Step 2: Get LLM response
+        print("\n🤖 Analyzing with LLM...")
+        response = self.llm.analyze_code(context, prompt)
+        
+        return response
+    
+    def query_stream(self, prompt: str, top_k: int = TOP_K_CHUNKS) -> Iterator[str]:
+        """
+        Like query, but returns the LLM response as an iterator of text
+        pieces so it can be printed as it arrives. Retrieval runs eagerly.
+        """
+        if not self.indexed:
+            if not self.index():
+                return iter(["Error: Repository not indexed. Please index first."])
+        
+        context = self._retrieve_context(prompt, top_k)
+        
+        print("\n🤖 Analyzing with LLM...")
+        return self.llm.analyze_code_stream(context, prompt)
+    
+    def _retrieve_context(self, prompt: str, top_k: int) -> str:
+        """Retrieve code for a query, show a summary, and format it for the LLM."""
         print(f"\n{'='*60}")
         print(f"🔍 Query: {prompt}")
         print(f"{'='*60}\n")
         
         # Step 1: Retrieve relevant code
         print("📚 Retrieving relevant code...")
-        context = self.retriever.retrieve_as_context(prompt, top_k)
+        results = self.retriever.retrieve(prompt, top_k)
         
         # Show what was retrieved
-        results = self.retriever.retrieve(prompt, top_k)
+        self._print_results(results)
+        
+        return self.retriever.format_context(results)
+    
+    async def aquery(self, prompt: str, top_k: int = TOP_K_CHUNKS) -> str:
+        """
+        Async variant of query: embedding/search run in a worker thread and
+        the LLM call uses the provider's async client, so several queries
+        can be awaited concurrently.
+        
+        Args:
+            prompt: User's question or request
+            top_k: Number of chunks to retrieve
+            
+        Returns:
+            LLM's response
+        """
+        if not self.indexed:
+            if not self.index():
+                return "Error: Repository not indexed. Please index first."
+        
+        print(f"\n{'='*60}")
+        print(f"🔍 Query: {prompt}")
+        print(f"{'='*60}\n")
+        
+        # Step 1: Retrieve relevant code
+        print("📚 Retrieving relevant code...")
+        results = await self.retriever.aretrieve(prompt, top_k)
+        context = self.retriever.format_context(results)
+        
+        # Show what was retrieved
+        self._print_results(results)
+        
+        # Step 2: Get LLM response
+        print("\n🤖 Analyzing with LLM...")
+        return await self.llm.aanalyze_code(context, prompt)
+    
+    async def aquery_many(self, prompts: list[str], top_k: int = TOP_K_CHUNKS) -> list[str]:
+        """
+        Answer several queries: one batched retrieval (single encode call and
+        index search), then concurrent LLM calls.
+        
+        Args:
+            prompts: User questions or requests
+            top_k: Number of chunks to retrieve per query
+            
+        Returns:
+            LLM responses, in the same order as prompts
+        """
+        if not self.indexed:
+            if not self.index():
+                return ["Error: Repository not indexed. Please index first."] * len(prompts)
+        
+        print(f"📚 Retrieving relevant code for {len(prompts)} queries...")
+        all_results = await asyncio.to_thread(self.retriever.retrieve_many, prompts, top_k)
+        for prompt, results in zip(prompts, all_results):
+            print(f"\n🔍 Query: {prompt}")
+            self._print_results(results)
+        
+        print("\n🤖 Analyzing with LLM...")
+        return await self.llm.aanalyze_many([
+            (self.retriever.format_context(results), prompt)
+            for prompt, results in zip(prompts, all_results)
+        ])
+    
+    def _print_results(self, results: list[tuple[CodeChunk, float]]):
+        """Show a short summary of retrieved chunks."""
         print(f"\n📄 Found {len(results)} relevant chunks:")
         for chunk, score in results[:5]:
             print(f"   • {chunk.file_path}:{chunk.start_line}-{chunk.end_line} (score: {score:.2f})")
         if len(results) > 5:
             print(f"   ... and {len(results) - 5} more")
-        
-        # Step 2: Get LLM response
-        print("\n🤖 Analyzing with LLM...")
-        response = self.llm.analyze_code(context, prompt)
-        
-        return response
     
     def suggest_fix(self, issue: str, top_k: int = TOP_K_CHUNKS) -> str:
         """
@@ -124,6 +235,15 @@ class CodingAgent:
         context = self.retriever.retrieve_as_context(issue, top_k)
         return self.llm.suggest_fix(context, issue)
     
+    async def asuggest_fix(self, issue: str, top_k: int = TOP_K_CHUNKS) -> str:
+        """Async variant of suggest_fix."""
+        if not self.indexed:
+            if not self.index():
+                return "Error: Repository not indexed. Please index first."
+        
+        context = await self.retriever.aretrieve_as_context(issue, top_k)
+        return await self.llm.asuggest_fix(context, issue)
+    
     def interactive(self):
         """Run an interactive REPL for queries."""
         print(f"\n{'='*60}")
@@ -131,10 +251,18 @@ class CodingAgent:
         print("='*60")
         print("Commands:")
         print("  /index   - Re-index the repository")
+        print("  /update  - Re-index only changed files")
         print("  /quit    - Exit")
         print("  /help    - Show this help")
         print(f"{'='*60}\n")
         
+        try:
+            self._repl()
+        finally:
+            self.llm.close()
+    
+    def _repl(self):
+        """Read-eval-print loop; answers are streamed as they are generated."""
         while True:
             try:
                 prompt = input("\n🔹 Your query: ").strip()
@@ -150,18 +278,17 @@ class CodingAgent:
                     self.index(force=True)
                     continue
                 
+                if prompt.lower() == "/update":
+                    self.update()
+                    continue
+                
                 if prompt.lower() == "/help":
-                    print("Commands: /index, /quit, /help")
+                    print("Commands: /index, /update, /quit, /help")
                     print("Or type any question about the code.")
                     continue
                 
                 # Process query
-                response = self.query(prompt)
-                
-                print(f"\n{'='*60}")
-                print("💡 Response:")
-                print(f"{'='*60}\n")
-                print(response)
+                _print_stream(self.query_stream(prompt))
                 
             except KeyboardInterrupt:
                 print("\n👋 Goodbye!")
@@ -170,6 +297,16 @@ class CodingAgent:
                 print(f"❌ Error: {e}")
 
 
+def _print_stream(stream: Iterator[str]):
+    """Print a streamed response piece by piece under a response header."""
+    print(f"\n{'='*60}")
+    print("💡 Response:")
+    print(f"{'='*60}\n")
+    for text in stream:
+        print(text, end="", flush=True)
+    print()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Mini Coding Agent - Repo-aware AI coding assistant",
@@ -179,6 +316,10 @@ Examples:
   # Index and query a repository
   python agent.py --repo ./my_project --prompt "find the authentication bug"
   
+  # Several queries, answered concurrently
+  python agent.py --repo ./my_project -p "where is config loaded?" -p "how are errors logged?"
+  python agent.py --repo ./my_project --prompts-file questions.txt
+  
   # Interactive mode
   python agent.py --repo ./my_project --interactive
   
@@ -200,7 +341,14 @@ Examples:
     parser.add_argument(
         "--prompt", "-p",
         type=str,
-        help="Query or request to process"
+        action="append",
+        help="Query or request to process (repeat to run several concurrently)"
+    )
+    
+    parser.add_argument(
+        "--prompts-file",
+        type=str,
+        help="File with one query per line, answered as a batch"
     )
     
     parser.add_argument(
@@ -222,6 +370,18 @@ Examples:
         help="Force re-indexing of the repository"
     )
     
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Incrementally re-index only files changed since the last index"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always call the LLM, ignoring cached responses"
+    )
+    
     parser.add_argument(
         "--top-k", "-k",
         type=int,
@@ -241,15 +401,25 @@ Examples:
     # Resolve repo path
     repo_path = str(Path(args.repo).resolve())
     
+    # Collect queries from --prompt and --prompts-file
+    prompts = list(args.prompt or [])
+    if args.prompts_file:
+        with open(args.prompts_file, "r", encoding="utf-8") as f:
+            prompts.extend(line.strip() for line in f if line.strip())
+    
     # Create agent
     agent = CodingAgent(
         repo_path=repo_path,
         index_name=args.index_name,
-        llm_provider=args.provider
+        llm_provider=args.provider,
+        use_cache=RESPONSE_CACHE_ENABLED and not args.no_cache
     )
     
     # Index if needed
-    if args.reindex or not agent.retriever.load_index(args.index_name):
+    if args.update and not args.reindex:
+        if not agent.update():
+            sys.exit(1)
+    elif args.reindex or not agent.retriever.load_index(args.index_name):
         if not agent.index(force=args.reindex):
             sys.exit(1)
     else:
@@ -258,12 +428,16 @@ Examples:
     # Run in interactive or single-query mode
     if args.interactive:
         agent.interactive()
-    elif args.prompt:
-        response = agent.query(args.prompt, args.top_k)
-        print(f"\n{'='*60}")
-        print("💡 Response:")
-        print(f"{'='*60}\n")
-        print(response)
+    elif len(prompts) == 1:
+        # Stream a single answer so output starts with the first token
+        _print_stream(agent.query_stream(prompts[0], args.top_k))
+    elif prompts:
+        responses = asyncio.run(agent.aquery_many(prompts, args.top_k))
+        for prompt, response in zip(prompts, responses):
+            print(f"\n{'='*60}")
+            print(f"💡 Response: {prompt}")
+            print(f"{'='*60}\n")
+            print(response)
     else:
         # Default to interactive if no prompt given
         agent.interactive()
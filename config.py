@@ -13,10 +13,10 @@ VECTOR_STORE_DIR = Path(__file__).parent / ".vector_store"
 
 # ============ INGESTION SETTINGS ============
 # File extensions to index
-SUPPORTED_EXTENSIONS = {".py", ".ts", ".js", ".jsx", ".tsx", ".java", ".go", ".rs", ".cpp", ".c", ".h"}
+SUPPORTED_EXTENSIONS = frozenset({".py", ".ts", ".js", ".jsx", ".tsx", ".java", ".go", ".rs", ".cpp", ".c", ".h"})
 
 # Directories to ignore
-IGNORE_DIRS = {
+IGNORE_DIRS = frozenset({
     ".git",
     "node_modules",
     "venv",
@@ -29,28 +29,80 @@ IGNORE_DIRS = {
     "target",
     ".idea",
     ".vscode",
-}
+})
 
 # Max file size to process (in bytes) - skip very large files
 MAX_FILE_SIZE = 100 * 1024  # 100 KB
 
+# Threads used to read files in parallel during ingestion (I/O bound)
+INGEST_READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
 # ============ CHUNKING SETTINGS ============
 # Target chunk size (in characters)
 CHUNK_SIZE = 1500
 CHUNK_OVERLAP = 200
 
+# Chunk files in a process pool when at least this many need chunking
+CHUNK_POOL_MIN_FILES = 32
+
 # ============ EMBEDDING SETTINGS ============
 # Embedding model (using sentence-transformers)
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
+# Device for the embedding model: "cpu", "cuda", ... (empty = auto-detect GPU)
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "")
+
+# Batch size passed to the embedding model when encoding chunks
+EMBED_BATCH_SIZE = 64
+EMBED_BATCH_SIZE_GPU = 128
+
+# Max number of query embeddings kept in the in-memory LRU cache
+QUERY_CACHE_SIZE = 512
+
+# Batch size used when encoding several queries at once
+QUERY_BATCH_SIZE = 32
+
+# ============ VECTOR INDEX SETTINGS ============
+# Stores with more vectors than this use an HNSW index instead of exact flat search
+HNSW_MIN_VECTORS = 2000
+# HNSW graph degree and build/search beam widths
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+# Incremental updates leave removed vectors in an HNSW graph (filtered out at
+# search time) until they exceed this share of it, then rebuild the graph
+HNSW_MAX_STALE_FRACTION = 0.1
+
+# Stores with more vectors than this use IVF-PQ (compressed, approximate)
+IVFPQ_MIN_VECTORS = 100_000
+# Max PQ sub-quantizers (largest divisor of the dimension <= this is used)
+IVFPQ_M = 48
+# Inverted lists probed per query (at least top_k)
+IVFPQ_NPROBE = 16
+
+# FAISS index files at least this large are memory-mapped on load
+INDEX_MMAP_MIN_BYTES = 64 * 1024 * 1024  # 64 MB
+
+# Store vectors as int8 (scalar quantization) - 4x less index memory
+INDEX_SQ8 = os.getenv("INDEX_SQ8", "0") == "1"
+# Quantized indexes fetch top_k * factor candidates for exact float32 re-ranking
+SQ8_RERANK_FACTOR = 5
+
 # ============ RETRIEVAL SETTINGS ============
 # Number of chunks to retrieve for context
 TOP_K_CHUNKS = 10
 
+# Chunks whose 64-bit SimHash signatures differ in at most this many bits
+# are treated as near-duplicates and only the best-scoring one is kept
+SIMHASH_MAX_DISTANCE = 3
+
 # ============ LLM SETTINGS ============
 # LLM Provider: "openai", "anthropic", or "groq"
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
 
+# Provider to switch to while the primary one keeps failing (empty = none)
+LLM_FALLBACK_PROVIDER = os.getenv("LLM_FALLBACK_PROVIDER", "")
+
 # Model names per provider
 LLM_MODELS = {
     "openai": "gpt-4o-mini",
@@ -58,11 +110,40 @@ LLM_MODELS = {
     "groq": "llama-3.1-8b-instant",
 }
 
+# Max concurrent requests when several prompts are sent at once
+LLM_MAX_CONCURRENCY = 10
+
+# Persistent HTTP connection pool per provider client
+LLM_HTTP_TIMEOUT = 60.0
+LLM_KEEPALIVE_CONNECTIONS = 20
+LLM_MAX_CONNECTIONS = 40
+
+# Retries for rate-limited / transient provider errors (exponential backoff + jitter)
+LLM_MAX_RETRIES = 5
+LLM_RETRY_INITIAL_DELAY = 1.0
+LLM_RETRY_MAX_DELAY = 30.0
+
+# Circuit breaker: stop calling a provider for a cooldown (seconds) after
+# this many consecutive transient failures
+LLM_CIRCUIT_THRESHOLD = 5
+LLM_CIRCUIT_COOLDOWN = 60.0
+
+# Seconds between status checks for provider batch jobs
+BATCH_POLL_INTERVAL = 30
+
 # API Keys (from environment)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 
+# ============ RESPONSE CACHE SETTINGS ============
+# Reuse LLM responses for repeated requests (set RESPONSE_CACHE=0 to disable)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_DIR = VECTOR_STORE_DIR / "response_cache"
+# Min cosine similarity between user requests (same model, task and code
+# context) to reuse a cached response
+RESPONSE_CACHE_THRESHOLD = 0.92
+
 # ============ AGENT SETTINGS ============
 # Max iterations for agent loop (future use)
 MAX_ITERATIONS = 5
@@ -4,15 +4,232 @@ Embedding and Vector Store module.
 STEP 3: Create embeddings and store in vector database.
 Uses sentence-transformers for embeddings and FAISS for vector search.
 """
+import hashlib
 import json
+import math
 import pickle
+import shutil
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
 
-from config import EMBEDDING_MODEL, VECTOR_STORE_DIR
+from config import (
+    EMBED_BATCH_SIZE,
+    EMBED_BATCH_SIZE_GPU,
+    EMBEDDING_DEVICE,
+    EMBEDDING_MODEL,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+    HNSW_MAX_STALE_FRACTION,
+    HNSW_MIN_VECTORS,
+    INDEX_MMAP_MIN_BYTES,
+    INDEX_SQ8,
+    IVFPQ_M,
+    IVFPQ_MIN_VECTORS,
+    IVFPQ_NPROBE,
+    QUERY_BATCH_SIZE,
+    QUERY_CACHE_SIZE,
+    SQ8_RERANK_FACTOR,
+    VECTOR_STORE_DIR,
+)
 from ingest import CodeChunk
+from tools import estimate_tokens, fingerprint, simhash
+
+
+# Files saved directly in the store directory before generation directories
+_LEGACY_STORE_FILES = (
+    "embeddings.npy", "chunks.npy", "chunks.npz", "chunks.json", "contents.bin",
+    "manifest.json", "index.faiss", "index_rows.npy",
+)
+
+# Enum order for the int8 chunk_type field (append only)
+CHUNK_TYPES = ("block", "function", "class")
+
+# Fixed-size per-chunk record in chunks.npy, memory-mapped on load
+CHUNK_RECORD_DTYPE = np.dtype([
+    ("fp_id", "<i4"),
+    ("start_line", "<i4"),
+    ("end_line", "<i4"),
+    ("chunk_type", "i1"),
+    ("token_count", "<i4"),
+    ("content_start", "<i8"),
+    ("content_end", "<i8"),
+    ("fingerprint", "<u8"),
+    ("simhash", "<u8"),
+])
+
+
+def chunk_hash(chunk: CodeChunk) -> str:
+    """Content-addressable key for a chunk's embedding (model + path + content)."""
+    key = f"{EMBEDDING_MODEL}\n{chunk.file_path}\n{chunk.content}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _chunk_columns(chunks: Sequence[CodeChunk]) -> tuple[np.ndarray, np.ndarray, list[bytes]]:
+    """(file path per chunk, chunk records, UTF-8 content per chunk) for saving CodeChunk objects."""
+    records = np.zeros(len(chunks), dtype=CHUNK_RECORD_DTYPE)
+    records["start_line"] = [c.start_line for c in chunks]
+    records["end_line"] = [c.end_line for c in chunks]
+    records["chunk_type"] = [CHUNK_TYPES.index(c.chunk_type) for c in chunks]
+    records["token_count"] = [
+        c.token_count if c.token_count is not None else estimate_tokens(c.content) for c in chunks
+    ]
+    records["fingerprint"] = [
+        c.fingerprint if c.fingerprint is not None else fingerprint(c.content) for c in chunks
+    ]
+    records["simhash"] = [
+        c.simhash if c.simhash is not None else simhash(c.content) for c in chunks
+    ]
+    paths = np.array([c.file_path for c in chunks], dtype=str)
+    return paths, records, [c.content.encode("utf-8") for c in chunks]
+
+
+class ChunkTable(Sequence):
+    """
+    Read-only, list-like view over columnar chunk storage.
+    CodeChunk objects (and their decoded content) are only built for the
+    rows that are accessed, e.g. the top-k results of a search. Chunks
+    added by an incremental update are kept as objects in `extra`, after
+    the columnar rows.
+    """
+    
+    def __init__(
+        self,
+        fp_table: list[str],
+        fp_ids: np.ndarray,
+        blob: np.ndarray,
+        content_starts: np.ndarray,
+        content_ends: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        types: np.ndarray,
+        fingerprints: Optional[np.ndarray] = None,
+        simhashes: Optional[np.ndarray] = None,
+        token_counts: Optional[np.ndarray] = None,
+        extra: Optional[list[CodeChunk]] = None
+    ):
+        self._fp_table = fp_table
+        self._fp_ids = fp_ids
+        self._blob = blob
+        self._content_starts = content_starts
+        self._content_ends = content_ends
+        self._starts = starts
+        self._ends = ends
+        self._types = types
+        self._fingerprints = fingerprints
+        self._simhashes = simhashes
+        self._token_counts = token_counts
+        self._extra = extra or []
+    
+    def __len__(self) -> int:
+        return len(self._fp_ids) + len(self._extra)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+        if i >= len(self._fp_ids):
+            return self._extra[i - len(self._fp_ids)]
+        
+        start_off, end_off = int(self._content_starts[i]), int(self._content_ends[i])
+        return CodeChunk(
+            file_path=self._fp_table[self._fp_ids[i]],
+            content=self._blob[start_off:end_off].tobytes().decode("utf-8"),
+            start_line=int(self._starts[i]),
+            end_line=int(self._ends[i]),
+            chunk_type=CHUNK_TYPES[self._types[i]],
+            fingerprint=int(self._fingerprints[i]) if self._fingerprints is not None else None,
+            simhash=int(self._simhashes[i]) if self._simhashes is not None else None,
+            token_count=int(self._token_counts[i]) if self._token_counts is not None else None
+        )
+    
+    def rows_by_file(self) -> dict[str, list[int]]:
+        """Row indices grouped by file path and sorted by start line, read from the columns only."""
+        order = np.lexsort((self._starts, self._fp_ids))
+        groups = np.split(order, np.flatnonzero(np.diff(self._fp_ids[order])) + 1)
+        by_file = {self._fp_table[self._fp_ids[rows[0]]]: rows.tolist() for rows in groups if len(rows)}
+        
+        if self._extra:
+            base = len(self._fp_ids)
+            extra_files = set()
+            for j, chunk in enumerate(self._extra):
+                by_file.setdefault(chunk.file_path, []).append(base + j)
+                extra_files.add(chunk.file_path)
+            for path in extra_files:
+                by_file[path].sort(
+                    key=lambda i: int(self._starts[i]) if i < base else self._extra[i - base].start_line
+                )
+        return by_file
+    
+    def rows_excluding(self, paths: set[str]) -> np.ndarray:
+        """Indices of rows whose file is not in paths, read from the path-id column."""
+        stale_ids = [i for i, path in enumerate(self._fp_table) if path in paths]
+        rows = np.flatnonzero(~np.isin(self._fp_ids, stale_ids))
+        base = len(self._fp_ids)
+        extra_rows = [base + j for j, chunk in enumerate(self._extra) if chunk.file_path not in paths]
+        return np.concatenate([rows, np.array(extra_rows, dtype=rows.dtype)])
+    
+    def take(self, rows: np.ndarray, new_chunks: list[CodeChunk]) -> "ChunkTable":
+        """New table with the given rows (in order) followed by new_chunks; contents are not decoded."""
+        rows = np.asarray(rows, dtype=np.int64)
+        base = len(self._fp_ids)
+        col_rows = rows[rows < base]
+        
+        def pick(column: Optional[np.ndarray]) -> Optional[np.ndarray]:
+            return column[col_rows] if column is not None else None
+        
+        return ChunkTable(
+            fp_table=self._fp_table,
+            fp_ids=self._fp_ids[col_rows],
+            blob=self._blob,
+            content_starts=self._content_starts[col_rows],
+            content_ends=self._content_ends[col_rows],
+            starts=self._starts[col_rows],
+            ends=self._ends[col_rows],
+            types=self._types[col_rows],
+            fingerprints=pick(self._fingerprints),
+            simhashes=pick(self._simhashes),
+            token_counts=pick(self._token_counts),
+            extra=[self._extra[i - base] for i in rows[rows >= base]] + list(new_chunks),
+        )
+    
+    def export_columns(self) -> tuple[np.ndarray, np.ndarray, list]:
+        """
+        (file path per row, chunk records, raw UTF-8 content per row) for
+        saving; columnar rows are copied without decoding their content.
+        """
+        n = len(self._fp_ids)
+        records = np.zeros(n, dtype=CHUNK_RECORD_DTYPE)
+        records["start_line"] = self._starts
+        records["end_line"] = self._ends
+        records["chunk_type"] = self._types
+        for field, column, compute in (
+            ("token_count", self._token_counts, estimate_tokens),
+            ("fingerprint", self._fingerprints, fingerprint),
+            ("simhash", self._simhashes, simhash),
+        ):
+            records[field] = column if column is not None else [compute(self[i].content) for i in range(n)]
+        
+        paths = np.asarray(self._fp_table, dtype=str)[self._fp_ids] if n else np.zeros(0, dtype=str)
+        contents = [
+            self._blob[start:end]
+            for start, end in zip(self._content_starts.tolist(), self._content_ends.tolist())
+        ]
+        
+        extra_paths, extra_records, extra_contents = _chunk_columns(self._extra)
+        return (
+            np.concatenate([paths, extra_paths]),
+            np.concatenate([records, extra_records]),
+            contents + extra_contents,
+        )
 
 
 class VectorStore:
@@ -27,17 +244,37 @@ class VectorStore:
         self.store_dir.mkdir(parents=True, exist_ok=True)
         
         self.model = None
+        self._batch_size = EMBED_BATCH_SIZE
         self.index = None
-        self.chunks: list[CodeChunk] = []
+        # FAISS id -> chunk row (-1 = removed) while an HNSW index holds vectors
+        # dropped by incremental updates; None when ids are the chunk rows
+        self._index_rows: Optional[np.ndarray] = None
+        self._stale_ids: Optional[np.ndarray] = None
+        # Large indexes are loaded memory-mapped read-only (copied before updates)
+        self._index_mmapped = False
+        self.chunks: Sequence[CodeChunk] = []
         self.embeddings: Optional[np.ndarray] = None
         
+        # {relative_path: content_hash} of the files the store was built from
+        self.manifest: dict[str, str] = {}
+        
+        # LRU cache of query string -> normalized float32 query vector
+        self._query_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        # Serializes query encoding when searches run from worker threads
+        self._query_lock = threading.Lock()
+        
     def _load_model(self):
         """Lazy-load the embedding model."""
         if self.model is None:
             try:
                 from sentence_transformers import SentenceTransformer
-                print(f"🔄 Loading embedding model: {EMBEDDING_MODEL}")
-                self.model = SentenceTransformer(EMBEDDING_MODEL)
+                device = EMBEDDING_DEVICE or self._detect_device()
+                print(f"🔄 Loading embedding model: {EMBEDDING_MODEL} ({device})")
+                self.model = SentenceTransformer(EMBEDDING_MODEL, device=device)
+                if device.startswith("cuda"):
+                    # FP16 halves VRAM and uses tensor cores; outputs are cast back to float32
+                    self.model.half()
+                    self._batch_size = EMBED_BATCH_SIZE_GPU
                 print("✅ Model loaded")
             except ImportError:
                 raise ImportError(
@@ -45,53 +282,301 @@ class VectorStore:
                 )
         return self.model
     
-    def _init_faiss_index(self, dimension: int):
-        """Initialize FAISS index."""
+    @staticmethod
+    def _detect_device() -> str:
+        """Pick "cuda" when a GPU is available, else "cpu"."""
+        try:
+            import torch
+            return "cuda" if torch.cuda.is_available() else "cpu"
+        except ImportError:
+            return "cpu"
+    
+    def _init_faiss_index(self, dimension: int, num_vectors: int = 0):
+        """
+        Initialize FAISS index.
+        
+        Small stores use an exact flat index; larger ones switch to HNSW
+        for sub-linear approximate search, and huge ones to IVF-PQ
+        (compressed, re-ranked like SQ8). With INDEX_SQ8 enabled, vectors
+        are stored as int8 (scalar quantization) and results are re-ranked
+        against the float32 embeddings.
+        """
         try:
             import faiss
-            self.index = faiss.IndexFlatIP(dimension)  # Inner Product (cosine similarity on normalized vectors)
+            kind = self._index_kind(num_vectors)
+            if kind == "ivfpq":
+                # Inverted lists + product quantization for huge stores;
+                # PQ sub-quantizers must evenly divide the dimension
+                nlist = int(4 * math.sqrt(num_vectors))
+                m = max(d for d in range(1, IVFPQ_M + 1) if dimension % d == 0)
+                quantizer = faiss.IndexFlatIP(dimension)
+                self.index = faiss.IndexIVFPQ(
+                    quantizer, dimension, nlist, m, 8, faiss.METRIC_INNER_PRODUCT
+                )
+            elif kind == "hnsw":
+                if INDEX_SQ8:
+                    self.index = faiss.IndexHNSWSQ(
+                        dimension, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT
+                    )
+                else:
+                    self.index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+                self.index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            elif INDEX_SQ8:
+                self.index = faiss.IndexScalarQuantizer(
+                    dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+                )
+            else:
+                self.index = faiss.IndexFlatIP(dimension)  # Inner Product (cosine similarity on normalized vectors)
         except ImportError:
             print("⚠️ FAISS not available, using numpy-based search")
             self.index = None
     
-    def embed_chunks(self, chunks: list[CodeChunk]) -> np.ndarray:
+    @staticmethod
+    def _index_kind(num_vectors: int) -> str:
+        """Index family for a store of num_vectors: "flat", "hnsw" or "ivfpq"."""
+        if num_vectors > IVFPQ_MIN_VECTORS:
+            return "ivfpq"
+        if num_vectors > HNSW_MIN_VECTORS:
+            return "hnsw"
+        return "flat"
+    
+    def _is_quantized(self) -> bool:
+        """Whether the FAISS index stores lossy (quantized) vectors."""
+        import faiss
+        return isinstance(
+            self.index, (faiss.IndexScalarQuantizer, faiss.IndexHNSWSQ, faiss.IndexIVFPQ)
+        )
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embed a single query (cached across repeated queries).
+        
+        Args:
+            query: Query string
+            
+        Returns:
+            Normalized float32 vector of shape (dim,)
+        """
+        return self._embed_queries([query])[0]
+    
+    def _embed_queries(self, queries: list[str]) -> np.ndarray:
+        """
+        Embed queries in one batched encode call, reusing cached vectors
+        for queries seen before.
+        
+        Args:
+            queries: Search query strings
+            
+        Returns:
+            Normalized float32 matrix of shape (len(queries), dim)
+        """
+        with self._query_lock:
+            misses = [q for q in dict.fromkeys(queries) if q not in self._query_cache]
+            
+            if misses:
+                model = self._load_model()
+                miss_embeddings = model.encode(
+                    misses,
+                    batch_size=QUERY_BATCH_SIZE,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                ).astype(np.float32)
+                for query, embedding in zip(misses, miss_embeddings):
+                    self._query_cache[query] = embedding
+            
+            embeddings = np.stack([self._query_cache[q] for q in queries])
+            
+            for query in queries:
+                self._query_cache.move_to_end(query)
+            while len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        
+        return embeddings
+    
+    def embed_chunks(
+        self,
+        chunks: list[CodeChunk],
+        reuse: Optional[dict[str, np.ndarray]] = None
+    ) -> np.ndarray:
         """
         Create embeddings for all chunks.
         
         Args:
             chunks: List of CodeChunk objects
+            reuse: {chunk_hash: embedding} of already-embedded chunks
+                (e.g. the previous build of this store, see embeddings_by_hash)
             
         Returns:
             Numpy array of embeddings
         """
-        model = self._load_model()
         self.chunks = chunks
+        embeddings = self._encode_chunks(chunks, reuse)
+        self.embeddings = embeddings
+        self._build_index(embeddings)
         
-        # Prepare texts for embedding
-        texts = []
-        for chunk in chunks:
-            # Include file path for better context
-            text = f"File: {chunk.file_path}\n{chunk.content}"
-            texts.append(text)
-        
-        print(f"🔄 Embedding {len(texts)} chunks...")
-        embeddings = model.encode(
-            texts,
-            show_progress_bar=True,
-            convert_to_numpy=True,
-            normalize_embeddings=True  # Normalize for cosine similarity
+        print(f"✅ Embedded {len(chunks)} chunks (dim={embeddings.shape[1]})")
+        return embeddings
+    
+    def update_files(self, stale_paths: set[str], new_chunks: list[CodeChunk]) -> np.ndarray:
+        """
+        Incrementally update the store: drop chunks of stale files, add new ones.
+        
+        Args:
+            stale_paths: Relative paths whose existing chunks should be removed
+                (deleted or changed files)
+            new_chunks: Chunks of new or changed files to embed and add
+            
+        Returns:
+            Numpy array of all embeddings after the update
+        """
+        # Loaded stores pick rows from the path-id column, so kept chunks are
+        # never materialized (only dropped ones, to reuse their embeddings)
+        if isinstance(self.chunks, ChunkTable):
+            keep = self.chunks.rows_excluding(stale_paths)
+        else:
+            keep = np.array(
+                [i for i, c in enumerate(self.chunks) if c.file_path not in stale_paths], dtype=np.int64
+            )
+        dropped = np.setdiff1d(np.arange(len(self.chunks)), keep)
+        new_embeddings = self._encode_chunks(new_chunks, self.embeddings_by_hash(dropped))
+        
+        if self.embeddings is not None:
+            embeddings = np.concatenate([self.embeddings[keep], new_embeddings])
+        else:
+            embeddings = new_embeddings
+        
+        if isinstance(self.chunks, ChunkTable):
+            self.chunks = self.chunks.take(keep, new_chunks)
+        else:
+            self.chunks = [self.chunks[int(i)] for i in keep] + new_chunks
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self._update_index(keep, dropped, new_embeddings)
+        
+        print(
+            f"✅ Updated store: -{len(stale_paths)} files, +{len(new_chunks)} chunks "
+            f"({len(self.chunks)} total)"
         )
+        return self.embeddings
+    
+    def embeddings_by_hash(self, rows: Optional[np.ndarray] = None) -> dict[str, np.ndarray]:
+        """
+        {chunk_hash: embedding} for the given rows (all rows by default),
+        so re-embedding can skip chunks whose file path and content are unchanged.
+        """
+        if self.embeddings is None or len(self.embeddings) != len(self.chunks):
+            return {}
+        if rows is None:
+            rows = range(len(self.chunks))
+        return {chunk_hash(self.chunks[int(i)]): self.embeddings[int(i)] for i in rows}
+    
+    def _encode_chunks(
+        self,
+        chunks: list[CodeChunk],
+        reuse: Optional[dict[str, np.ndarray]] = None
+    ) -> np.ndarray:
+        """Embed chunks, taking unchanged ones from `reuse` ({chunk_hash: embedding})."""
+        reuse = reuse or {}
+        vectors = [reuse.get(chunk_hash(chunk)) for chunk in chunks]
+        miss_indices = [i for i, vector in enumerate(vectors) if vector is None]
         
-        self.embeddings = embeddings
+        print(f"🔄 Embedding {len(chunks)} chunks ({len(chunks) - len(miss_indices)} cached)...")
+        if miss_indices:
+            model = self._load_model()
+            # Include file path for better context
+            miss_texts = [
+                f"File: {chunks[i].file_path}\n{chunks[i].content}"
+                for i in miss_indices
+            ]
+            miss_embeddings = model.encode(
+                miss_texts,
+                batch_size=self._batch_size,
+                show_progress_bar=True,
+                convert_to_numpy=True,
+                normalize_embeddings=True  # Normalize for cosine similarity
+            ).astype(np.float32)
+            for i, embedding in zip(miss_indices, miss_embeddings):
+                vectors[i] = embedding
+        
+        if chunks:
+            return np.stack(vectors).astype(np.float32)
         
-        # Initialize FAISS index
-        self._init_faiss_index(embeddings.shape[1])
+        dimension = self._load_model().get_sentence_embedding_dimension()
+        return np.empty((0, dimension), dtype=np.float32)
+    
+    def _build_index(self, embeddings: np.ndarray):
+        """(Re)build the FAISS index from the full embedding matrix."""
+        self._set_index_rows(None)
+        self._index_mmapped = False
+        self._init_faiss_index(embeddings.shape[1], len(embeddings))
         if self.index is not None:
-            import faiss
-            self.index.add(embeddings.astype(np.float32))
+            vectors = embeddings.astype(np.float32)
+            if not self.index.is_trained:
+                self.index.train(vectors)
+            self.index.add(vectors)
+    
+    def _set_index_rows(self, rows: Optional[np.ndarray]):
+        self._index_rows = rows
+        self._stale_ids = np.flatnonzero(rows < 0).astype(np.int64) if rows is not None else None
+    
+    def _update_index(self, keep: np.ndarray, dropped: np.ndarray, new_embeddings: np.ndarray):
+        """
+        Apply an incremental update to the FAISS index instead of rebuilding it.
+        self.embeddings already holds the kept rows (in order) followed by the
+        new ones. Flat and SQ8 indexes remove the dropped rows (remaining ids
+        shift down, staying aligned with the rows) and append the new vectors;
+        IVF-PQ re-adds all vectors without retraining; HNSW, which cannot
+        remove vectors, only filters them out until HNSW_MAX_STALE_FRACTION.
+        Changing index family (store size crossed a threshold) rebuilds.
+        """
+        old_rows = len(keep) + len(dropped)
+        indexed = len(self._index_rows) if self._index_rows is not None else old_rows
+        if (
+            self.index is None
+            or self.index.ntotal != indexed
+            or self._index_kind(len(self.embeddings)) != self._index_kind_of(self.index)
+        ):
+            self._build_index(self.embeddings)
+            return
         
-        print(f"✅ Embedded {len(chunks)} chunks (dim={embeddings.shape[1]})")
-        return embeddings
+        import faiss
+        if self._index_mmapped:
+            self.index = faiss.clone_index(self.index)
+            self._index_mmapped = False
+        
+        new_vectors = np.ascontiguousarray(new_embeddings, dtype=np.float32)
+        kind = self._index_kind_of(self.index)
+        if kind == "flat":
+            if len(dropped):
+                self.index.remove_ids(np.asarray(dropped, dtype=np.int64))
+            self.index.add(new_vectors)
+        elif kind == "ivfpq":
+            if len(dropped):
+                self.index.reset()  # keeps the trained coarse and PQ quantizers
+                self.index.add(self.embeddings)
+            else:
+                self.index.add(new_vectors)
+        else:
+            rows = self._index_rows if self._index_rows is not None else np.arange(old_rows)
+            new_pos = np.full(old_rows, -1, dtype=np.int64)
+            new_pos[keep] = np.arange(len(keep))
+            rows = np.where(rows >= 0, new_pos[np.maximum(rows, 0)], -1)
+            stale = int((rows < 0).sum())
+            if stale > HNSW_MAX_STALE_FRACTION * (len(rows) + len(new_vectors)):
+                self._build_index(self.embeddings)
+                return
+            self.index.add(new_vectors)
+            rows = np.concatenate([rows, np.arange(len(keep), len(self.embeddings))])
+            self._set_index_rows(rows if stale else None)
+    
+    @staticmethod
+    def _index_kind_of(index) -> str:
+        """Index family of an existing FAISS index (see _index_kind)."""
+        import faiss
+        if isinstance(index, faiss.IndexIVFPQ):
+            return "ivfpq"
+        if hasattr(index, "hnsw"):
+            return "hnsw"
+        return "flat"
     
     def search(self, query: str, top_k: int = 10) -> list[tuple[CodeChunk, float]]:
         """
@@ -104,77 +589,277 @@ class VectorStore:
         Returns:
             List of (chunk, score) tuples, sorted by relevance
         """
+        return self.search_batch([query], top_k)[0]
+    
+    def search_batch(
+        self,
+        queries: list[str],
+        top_k: int = 10
+    ) -> list[list[tuple[CodeChunk, float]]]:
+        """
+        Search for several queries with one encode call and one index search.
+        
+        Args:
+            queries: Search query strings
+            top_k: Number of results to return per query
+            
+        Returns:
+            One list of (chunk, score) tuples per query, sorted by relevance
+        """
         if self.embeddings is None or len(self.chunks) == 0:
             raise ValueError("No embeddings loaded. Run embed_chunks first or load from disk.")
+        if not queries:
+            return []
         
-        model = self._load_model()
+        # Embed queries (cached across repeated queries)
+        return self.search_embeddings(self._embed_queries(queries), top_k)
+    
+    def search_embeddings(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 10
+    ) -> list[list[tuple[CodeChunk, float]]]:
+        """
+        Search with precomputed, normalized query vectors, e.g. from
+        embed_query or an encoder shared with another component.
         
-        # Embed query
-        query_embedding = model.encode(
-            [query],
-            convert_to_numpy=True,
-            normalize_embeddings=True
-        ).astype(np.float32)
+        Args:
+            query_embeddings: (num_queries, dim) float32 matrix
+            top_k: Number of results to return per query
+            
+        Returns:
+            One list of (chunk, score) tuples per query, sorted by relevance
+        """
+        if self.embeddings is None or len(self.chunks) == 0:
+            raise ValueError("No embeddings loaded. Run embed_chunks first or load from disk.")
+        
+        query_embeddings = np.ascontiguousarray(np.atleast_2d(query_embeddings), dtype=np.float32)
+        if len(query_embeddings) == 0:
+            return []
         
         if self.index is not None:
             # Use FAISS for search
-            scores, indices = self.index.search(query_embedding, min(top_k, len(self.chunks)))
-            results = [(self.chunks[idx], float(score)) for idx, score in zip(indices[0], scores[0])]
+            return self._faiss_search(query_embeddings, top_k)
+        
+        # Fallback: numpy cosine similarity, one (N, num_queries) matmul
+        similarities = np.dot(self.embeddings, query_embeddings.T)
+        k = min(top_k, len(similarities))
+        all_results = []
+        for column in similarities.T:
+            # Partial selection of the top-k, then sort only those
+            part = np.argpartition(-column, k - 1)[:k]
+            top_indices = part[np.argsort(-column[part])]
+            all_results.append([(self.chunks[idx], float(column[idx])) for idx in top_indices])
+        
+        return all_results
+    
+    def _faiss_search(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int
+    ) -> list[list[tuple[CodeChunk, float]]]:
+        """
+        Run a FAISS search for a (num_queries, dim) matrix of query vectors.
+        
+        Quantized indexes over-fetch candidates and re-rank them exactly
+        against the stored float32 embeddings.
+        """
+        quantized = self._is_quantized()
+        fetch_k = top_k * SQ8_RERANK_FACTOR if quantized else top_k
+        
+        params = None
+        if hasattr(self.index, "hnsw"):
+            ef_search = max(fetch_k * 4, HNSW_EF_SEARCH)
+            if self._stale_ids is not None:
+                # Skip vectors removed by incremental updates during the graph search
+                import faiss
+                removed = faiss.IDSelectorBatch(self._stale_ids)
+                live = faiss.IDSelectorNot(removed)
+                params = faiss.SearchParametersHNSW(sel=live, efSearch=ef_search)
+            else:
+                self.index.hnsw.efSearch = ef_search
+        if hasattr(self.index, "nprobe"):
+            self.index.nprobe = max(IVFPQ_NPROBE, top_k)
+        k = min(fetch_k, len(self.chunks))
+        if params is not None:
+            scores, indices = self.index.search(query_embeddings, k, params=params)
         else:
-            # Fallback: numpy cosine similarity
-            similarities = np.dot(self.embeddings, query_embedding.T).flatten()
-            top_indices = np.argsort(similarities)[-top_k:][::-1]
-            results = [(self.chunks[idx], float(similarities[idx])) for idx in top_indices]
+            scores, indices = self.index.search(query_embeddings, k)
         
-        return results
+        all_results = []
+        for query_embedding, row_scores, row_indices in zip(query_embeddings, scores, indices):
+            keep = row_indices >= 0  # ANN indexes pad missing results with -1
+            row_scores, row_indices = row_scores[keep], row_indices[keep]
+            if self._index_rows is not None:
+                row_indices = self._index_rows[row_indices]
+            
+            if quantized:
+                # Exact re-rank of the candidates with the float32 vectors
+                row_scores = self.embeddings[row_indices] @ query_embedding
+                order = np.argsort(-row_scores)[:top_k]
+                row_scores, row_indices = row_scores[order], row_indices[order]
+            
+            all_results.append([
+                (self.chunks[idx], float(score))
+                for idx, score in zip(row_indices, row_scores)
+            ])
+        
+        return all_results
     
     def save(self, name: str = "default"):
-        """Save embeddings and chunks to disk."""
-        save_path = self.store_dir / name
-        save_path.mkdir(parents=True, exist_ok=True)
+        """
+        Save embeddings and chunks to disk.
+        
+        Each save writes a fresh generation directory and then switches the
+        CURRENT pointer to it, so files that a loaded store may still have
+        memory-mapped are never replaced in place (Windows refuses to replace
+        a mapped file). Older generations are removed once nothing maps them.
+        """
+        store_path = self.store_dir / name
+        store_path.mkdir(parents=True, exist_ok=True)
+        generation = self._next_generation(store_path)
+        save_path = store_path / generation
+        save_path.mkdir()
         
         # Save embeddings
         if self.embeddings is not None:
-            np.save(save_path / "embeddings.npy", self.embeddings)
-        
-        # Save chunks metadata
-        chunks_data = [
-            {
-                "file_path": c.file_path,
-                "content": c.content,
-                "start_line": c.start_line,
-                "end_line": c.end_line,
-                "chunk_type": c.chunk_type
-            }
-            for c in self.chunks
-        ]
-        with open(save_path / "chunks.json", "w", encoding="utf-8") as f:
-            json.dump(chunks_data, f, indent=2)
+            np.save(save_path / "embeddings.npy", np.asarray(self.embeddings, dtype=np.float32))
+        
+        # Save chunk records + contents blob
+        self._save_chunks(save_path)
         
-        # Save FAISS index if available
+        # Save file manifest (used for incremental updates)
+        with open(save_path / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        
+        # Save FAISS index if available, with the id -> row map of an HNSW
+        # index that still holds removed vectors
         if self.index is not None:
             import faiss
             faiss.write_index(self.index, str(save_path / "index.faiss"))
+            if self._index_rows is not None:
+                np.save(save_path / "index_rows.npy", self._index_rows)
+        
+        # Switch to the new generation atomically
+        pointer_tmp = store_path / "CURRENT.tmp"
+        pointer_tmp.write_text(generation, encoding="utf-8")
+        pointer_tmp.replace(store_path / "CURRENT")
+        self._remove_old_generations(store_path, generation)
         
         print(f"💾 Saved vector store to {save_path}")
     
+    @staticmethod
+    def _next_generation(store_path: Path) -> str:
+        numbers = [
+            int(entry.name[len("gen-"):]) for entry in store_path.glob("gen-*")
+            if entry.name[len("gen-"):].isdigit()
+        ]
+        return f"gen-{max(numbers, default=0) + 1:06d}"
+    
+    @staticmethod
+    def _current_path(store_path: Path) -> Path:
+        """Directory of the store's current generation (the store itself for older layouts)."""
+        pointer = store_path / "CURRENT"
+        if pointer.exists():
+            return store_path / pointer.read_text(encoding="utf-8").strip()
+        return store_path
+    
+    @staticmethod
+    def _remove_old_generations(store_path: Path, current: str):
+        """
+        Delete superseded generations and files of the pre-generation layout.
+        Files still mapped by a loaded store cannot be deleted on Windows;
+        they are skipped here and removed by a later save.
+        """
+        for entry in store_path.glob("gen-*"):
+            if entry.name != current and entry.is_dir():
+                shutil.rmtree(entry, ignore_errors=True)
+        for legacy in _LEGACY_STORE_FILES:
+            try:
+                (store_path / legacy).unlink(missing_ok=True)
+            except OSError:
+                pass
+    
+    def _save_chunks(self, save_path: Path):
+        """
+        Save chunks as one fixed-size record per chunk in chunks.npy (path
+        id, line numbers, type, cached token count / hashes, content byte
+        range) plus the deduplicated file path table in chunks.npz. Contents
+        go to contents.bin as one raw UTF-8 blob. Both the records and the
+        blob are memory-mapped on load. Rows of a loaded ChunkTable are
+        copied column-wise, without building CodeChunk objects.
+        """
+        if isinstance(self.chunks, ChunkTable):
+            paths, records, contents = self.chunks.export_columns()
+        else:
+            paths, records, contents = _chunk_columns(self.chunks)
+        
+        fp_table, fp_ids = np.unique(paths, return_inverse=True)
+        offsets = np.zeros(len(contents) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in contents])
+        records["fp_id"] = fp_ids
+        records["content_start"] = offsets[:-1]
+        records["content_end"] = offsets[1:]
+        
+        with open(save_path / "contents.bin", "wb") as f:
+            for b in contents:
+                f.write(b)
+        
+        np.save(save_path / "chunks.npy", records)
+        np.savez(save_path / "chunks.npz", fp_table=fp_table)
+    
+    @staticmethod
+    def _load_chunks(load_path: Path) -> "ChunkTable":
+        """Open chunk storage; records and contents stay memory-mapped until accessed."""
+        with np.load(load_path / "chunks.npz") as data:
+            fp_table = data["fp_table"].tolist()
+        
+        blob_path = load_path / "contents.bin"
+        if blob_path.exists() and blob_path.stat().st_size > 0:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            blob = np.zeros(0, dtype=np.uint8)
+        
+        records = np.load(load_path / "chunks.npy", mmap_mode="r")
+        return ChunkTable(
+            fp_table=fp_table,
+            fp_ids=records["fp_id"],
+            blob=blob,
+            content_starts=records["content_start"],
+            content_ends=records["content_end"],
+            starts=records["start_line"],
+            ends=records["end_line"],
+            types=records["chunk_type"],
+            fingerprints=records["fingerprint"],
+            simhashes=records["simhash"],
+            token_counts=records["token_count"],
+        )
+    
     def load(self, name: str = "default") -> bool:
         """Load embeddings and chunks from disk."""
-        load_path = self.store_dir / name
+        store_path = self.store_dir / name
         
-        if not load_path.exists():
-            print(f"⚠️ No saved store found at {load_path}")
+        if not store_path.exists():
+            print(f"⚠️ No saved store found at {store_path}")
             return False
+        load_path = self._current_path(store_path)
         
         # Load embeddings
         embeddings_path = load_path / "embeddings.npy"
         if embeddings_path.exists():
-            self.embeddings = np.load(embeddings_path)
+            # Memory-map so only pages touched by search are read; saved
+            # arrays are contiguous float32, so np.dot hits BLAS without a copy
+            self.embeddings = np.ascontiguousarray(
+                np.load(embeddings_path, mmap_mode="r"), dtype=np.float32
+            )
         
-        # Load chunks
-        chunks_path = load_path / "chunks.json"
-        if chunks_path.exists():
-            with open(chunks_path, "r", encoding="utf-8") as f:
+        # Load chunks (chunks.json is the pre-columnar format)
+        chunks_records_path = load_path / "chunks.npy"
+        chunks_json_path = load_path / "chunks.json"
+        if chunks_records_path.exists():
+            self.chunks = self._load_chunks(load_path)
+        elif chunks_json_path.exists():
+            with open(chunks_json_path, "r", encoding="utf-8") as f:
                 chunks_data = json.load(f)
             self.chunks = [
                 CodeChunk(
@@ -187,12 +872,29 @@ class VectorStore:
                 for c in chunks_data
             ]
         
+        # Load file manifest (absent for stores built before incremental updates)
+        manifest_path = load_path / "manifest.json"
+        if manifest_path.exists():
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        
         # Load FAISS index if available
         index_path = load_path / "index.faiss"
         if index_path.exists():
             try:
                 import faiss
-                self.index = faiss.read_index(str(index_path))
+                # Large indexes are memory-mapped read-only rather than read
+                # into RAM; _update_index copies them before modifying
+                self._index_mmapped = index_path.stat().st_size >= INDEX_MMAP_MIN_BYTES
+                if self._index_mmapped:
+                    self.index = faiss.read_index(
+                        str(index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                    )
+                else:
+                    self.index = faiss.read_index(str(index_path))
+                rows_path = load_path / "index_rows.npy"
+                if rows_path.exists():
+                    self._set_index_rows(np.load(rows_path))
             except ImportError:
                 print("⚠️ FAISS not available, using numpy search")
                 self._init_faiss_index(self.embeddings.shape[1] if self.embeddings is not None else 384)
@@ -212,14 +914,57 @@ def index_repository(repo_path: str, store_name: str = "default") -> VectorStore
     Returns:
         Populated VectorStore instance
     """
-    from ingest import ingest_repository
+    from ingest import ingest_changed_files
     
     # Ingest repository
-    chunks = ingest_repository(repo_path)
+    chunks, manifest = ingest_changed_files(repo_path)
     
-    # Create and populate vector store
+    # Create and populate vector store; the previous build of this store (if
+    # any) serves as the embedding cache for chunks that did not change
     store = VectorStore()
-    store.embed_chunks(chunks)
+    previous = (store.store_dir / store_name).exists() and store.load(store_name)
+    reuse = store.embeddings_by_hash() if previous else {}
+    store.manifest = manifest
+    store.embed_chunks(chunks, reuse)
+    store.save(store_name)
+    
+    return store
+
+
+def update_repository(repo_path: str, store_name: str = "default") -> VectorStore:
+    """
+    Incrementally re-index a repository: only re-chunk and re-embed files
+    whose content changed since the store was saved.
+    Falls back to a full index if no store (or manifest) exists yet.
+    
+    Args:
+        repo_path: Path to repository
+        store_name: Name of the vector store to update
+        
+    Returns:
+        Updated VectorStore instance
+    """
+    from ingest import ingest_changed_files
+    
+    store = VectorStore()
+    if not store.load(store_name) or not store.manifest:
+        return index_repository(repo_path, store_name)
+    
+    new_chunks, manifest = ingest_changed_files(repo_path, store.manifest)
+    
+    # Changed files and deleted files both lose their old chunks
+    stale_paths = {
+        path for path, digest in store.manifest.items()
+        if manifest.get(path) != digest
+    }
+    added_paths = set(manifest) - set(store.manifest)
+    
+    if not stale_paths and not added_paths:
+        print("✅ Index is up to date")
+        return store
+    
+    store.update_files(stale_paths, new_chunks)
+    store.manifest = manifest
     store.save(store_name)
     
     return store
@@ -3,20 +3,21 @@ Repository ingestion module - scans and chunks codebase.
 
 STEP 1 & 2: Repo scanning + intelligent chunking.
 """
-import os
-import re
-from dataclasses import dataclass
+import ast
+import hashlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Generator
-
-from config import CHUNK_SIZE, CHUNK_OVERLAP
-from tools import (
-    should_ignore_path,
-    is_supported_file,
-    is_file_too_large,
-    read_file_content,
-    get_relative_path,
+from typing import Generator, Optional
+
+from config import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    CHUNK_POOL_MIN_FILES,
+    INGEST_READ_WORKERS,
 )
+from tools import read_file_content, get_relative_path, estimate_tokens, fingerprint, scan_repo, simhash
 
 
 @dataclass
@@ -27,6 +28,9 @@ class CodeChunk:
     start_line: int     # Starting line number
     end_line: int       # Ending line number
     chunk_type: str     # "function", "class", or "block"
+    fingerprint: Optional[int] = field(default=None, compare=False)  # Exact-content hash
+    simhash: Optional[int] = field(default=None, compare=False)  # Near-duplicate signature
+    token_count: Optional[int] = field(default=None, compare=False)  # Cached estimate_tokens(content)
     
     def __repr__(self):
         return f"CodeChunk({self.file_path}:{self.start_line}-{self.end_line}, type={self.chunk_type})"
@@ -36,27 +40,17 @@ def load_files(repo_path: str) -> Generator[tuple[Path, str, str], None, None]:
     """
     Walk repository and yield (file_path, relative_path, content) for supported files.
     Skips ignored directories and unsupported file types.
+    File reads are overlapped on a thread pool; results keep walk order.
     """
     repo = Path(repo_path).resolve()
     
     if not repo.exists():
         raise ValueError(f"Repository path does not exist: {repo_path}")
     
-    for root, dirs, filenames in os.walk(repo):
-        # Modify dirs in-place to skip ignored directories
-        dirs[:] = [d for d in dirs if d not in {"node_modules", ".git", "venv", ".venv", "__pycache__", ".pytest_cache", "dist", "build", ".next", "target", ".idea", ".vscode"}]
-        
-        for name in filenames:
-            file_path = Path(root) / name
-            
-            # Skip unsupported or too large files
-            if not is_supported_file(file_path):
-                continue
-            if is_file_too_large(file_path):
-                print(f"Skipping large file: {file_path}")
-                continue
-            
-            content = read_file_content(file_path)
+    paths = [file_path for file_path, _ in scan_repo(repo)]
+    
+    with ThreadPoolExecutor(max_workers=INGEST_READ_WORKERS) as executor:
+        for file_path, content in zip(paths, executor.map(read_file_content, paths)):
             if content:
                 relative_path = get_relative_path(file_path, repo)
                 yield file_path, relative_path, content
@@ -64,82 +58,45 @@ def load_files(repo_path: str) -> Generator[tuple[Path, str, str], None, None]:
 
 def extract_python_chunks(content: str, file_path: str) -> list[CodeChunk]:
     """
-    Extract functions and classes from Python code.
-    Falls back to block chunking if no structures found.
+    Extract top-level functions and classes from Python code using the AST.
+    Module-level code between definitions becomes "block" chunks.
+    Falls back to size-based chunking if the file does not parse.
     """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return chunk_by_size(content, file_path)
+    
     chunks = []
     lines = content.split("\n")
     
-    # Patterns for Python
-    func_pattern = re.compile(r"^(\s*)(async\s+)?def\s+\w+")
-    class_pattern = re.compile(r"^(\s*)class\s+\w+")
-    
-    current_chunk = []
-    current_start = 1
-    current_type = "block"
-    base_indent = 0
+    def add_chunk(start_line: int, end_line: int, chunk_type: str):
+        # Line numbers are 1-based and inclusive; skip whitespace-only gaps
+        text = "\n".join(lines[start_line - 1:end_line])
+        if text.strip():
+            chunks.append(CodeChunk(
+                file_path=file_path,
+                content=text,
+                start_line=start_line,
+                end_line=end_line,
+                chunk_type=chunk_type
+            ))
     
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        
-        # Check for function or class definition
-        func_match = func_pattern.match(line)
-        class_match = class_pattern.match(line)
-        
-        if func_match or class_match:
-            # Save previous chunk if exists
-            if current_chunk:
-                chunks.append(CodeChunk(
-                    file_path=file_path,
-                    content="\n".join(current_chunk),
-                    start_line=current_start,
-                    end_line=i,
-                    chunk_type=current_type
-                ))
-            
-            # Start new chunk
-            current_start = i + 1
-            current_type = "function" if func_match else "class"
-            base_indent = len(func_match.group(1) if func_match else class_match.group(1))
-            current_chunk = [line]
-            i += 1
-            
-            # Collect the entire function/class body
-            while i < len(lines):
-                next_line = lines[i]
-                # Check if we're still in the function/class
-                if next_line.strip() == "":
-                    current_chunk.append(next_line)
-                    i += 1
-                    continue
-                
-                current_indent = len(next_line) - len(next_line.lstrip())
-                if next_line.strip() and current_indent <= base_indent:
-                    # Hit a line at same or lower indentation
-                    if func_pattern.match(next_line) or class_pattern.match(next_line):
-                        break
-                    elif current_indent < base_indent:
-                        break
-                
-                current_chunk.append(next_line)
-                i += 1
-            
-            # Don't increment i here, let main loop check for new pattern
+    next_line = 1
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
             continue
         
-        current_chunk.append(line)
-        i += 1
+        # Decorators belong to the definition they wrap
+        start_line = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        chunk_type = "class" if isinstance(node, ast.ClassDef) else "function"
+        
+        add_chunk(next_line, start_line - 1, "block")
+        add_chunk(start_line, node.end_lineno, chunk_type)
+        next_line = node.end_lineno + 1
     
-    # Save remaining chunk
-    if current_chunk:
-        chunks.append(CodeChunk(
-            file_path=file_path,
-            content="\n".join(current_chunk),
-            start_line=current_start,
-            end_line=len(lines),
-            chunk_type=current_type
-        ))
+    # Trailing module-level code
+    add_chunk(next_line, len(lines), "block")
     
     return chunks
 
@@ -151,43 +108,39 @@ def chunk_by_size(content: str, file_path: str) -> list[CodeChunk]:
     """
     chunks = []
     lines = content.split("\n")
+    line_lens = [len(line) + 1 for line in lines]  # +1 for newline
     
-    current_chunk = []
+    start = 0          # Index of the first line in the current chunk
     current_chars = 0
-    current_start = 1
     
-    for i, line in enumerate(lines, 1):
-        current_chunk.append(line)
-        current_chars += len(line) + 1  # +1 for newline
+    for end, line_len in enumerate(line_lens):
+        current_chars += line_len
         
         if current_chars >= CHUNK_SIZE:
             chunks.append(CodeChunk(
                 file_path=file_path,
-                content="\n".join(current_chunk),
-                start_line=current_start,
-                end_line=i,
+                content="\n".join(lines[start:end + 1]),
+                start_line=start + 1,
+                end_line=end + 1,
                 chunk_type="block"
             ))
             
-            # Overlap: keep last few lines
-            overlap_lines = []
+            # Overlap: step back over the last few lines that fit in CHUNK_OVERLAP
+            new_start = end + 1
             overlap_chars = 0
-            for ln in reversed(current_chunk):
-                if overlap_chars + len(ln) > CHUNK_OVERLAP:
-                    break
-                overlap_lines.insert(0, ln)
-                overlap_chars += len(ln) + 1
+            while new_start > start and overlap_chars + line_lens[new_start - 1] - 1 <= CHUNK_OVERLAP:
+                new_start -= 1
+                overlap_chars += line_lens[new_start]
             
-            current_chunk = overlap_lines
+            start = new_start
             current_chars = overlap_chars
-            current_start = i - len(overlap_lines) + 1
     
     # Don't forget remaining content
-    if current_chunk:
+    if start < len(lines):
         chunks.append(CodeChunk(
             file_path=file_path,
-            content="\n".join(current_chunk),
-            start_line=current_start,
+            content="\n".join(lines[start:]),
+            start_line=start + 1,
             end_line=len(lines),
             chunk_type="block"
         ))
@@ -213,31 +166,80 @@ def chunk_code(content: str, file_path: str) -> list[CodeChunk]:
         return chunk_by_size(content, file_path)
 
 
-def ingest_repository(repo_path: str) -> list[CodeChunk]:
+def _chunk_one(item: tuple[str, str]) -> list[CodeChunk]:
+    """Chunk one (relative_path, content) pair; module-level so it pickles for Pool."""
+    relative_path, content = item
+    chunks = chunk_code(content, relative_path)
+    for chunk in chunks:
+        chunk.fingerprint = fingerprint(chunk.content)
+        chunk.simhash = simhash(chunk.content)
+        chunk.token_count = estimate_tokens(chunk.content)
+    return chunks
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 fingerprint of a file's content, used for incremental re-indexing."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def ingest_changed_files(
+    repo_path: str,
+    manifest: Optional[dict[str, str]] = None
+) -> tuple[list[CodeChunk], dict[str, str]]:
     """
-    Main ingestion function: scan repo and return all chunks.
+    Scan repo and chunk only files whose content changed since `manifest`.
     
     Args:
         repo_path: Path to the repository root
+        manifest: Previous {relative_path: content_hash}; None chunks every file
         
     Returns:
-        List of CodeChunk objects ready for embedding
+        (chunks of new/changed files, current {relative_path: content_hash})
     """
-    all_chunks = []
+    manifest = manifest or {}
+    changed_files = []
+    current_manifest = {}
     file_count = 0
     
     print(f"📂 Ingesting repository: {repo_path}")
     
     for file_path, relative_path, content in load_files(repo_path):
-        chunks = chunk_code(content, relative_path)
-        all_chunks.extend(chunks)
+        digest = content_hash(content)
+        current_manifest[relative_path] = digest
         file_count += 1
         
+        if manifest.get(relative_path) != digest:
+            changed_files.append((relative_path, content))
+        
         if file_count % 10 == 0:
             print(f"  Processed {file_count} files...")
     
-    print(f"✅ Ingested {file_count} files into {len(all_chunks)} chunks")
-    return all_chunks
+    all_chunks = []
+    if len(changed_files) < CHUNK_POOL_MIN_FILES:
+        # Not worth the process pool start-up cost
+        for chunks in map(_chunk_one, changed_files):
+            all_chunks.extend(chunks)
+    else:
+        with multiprocessing.Pool() as pool:
+            for chunks in pool.imap(_chunk_one, changed_files, chunksize=16):
+                all_chunks.extend(chunks)
+    
+    print(f"✅ Ingested {len(changed_files)}/{file_count} changed files into {len(all_chunks)} chunks")
+    return all_chunks, current_manifest
+
+
+def ingest_repository(repo_path: str) -> list[CodeChunk]:
+    """
+    Main ingestion function: scan repo and return all chunks.
+    
+    Args:
+        repo_path: Path to the repository root
+        
+    Returns:
+        List of CodeChunk objects ready for embedding
+    """
+    chunks, _ = ingest_changed_files(repo_path)
+    return chunks
 
 
 if __name__ == "__main__":
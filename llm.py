@@ -3,46 +3,264 @@ LLM wrapper module.
 
 STEP 5: Interface to various LLM providers (OpenAI, Anthropic, Groq).
 """
+import asyncio
+import functools
+import importlib
+import json
+import random
+import time
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Any, Awaitable, Callable, Iterator, Optional, Union
 
 from config import (
+    LLM_HTTP_TIMEOUT,
+    LLM_KEEPALIVE_CONNECTIONS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_CONNECTIONS,
     LLM_PROVIDER,
     LLM_MODELS,
     OPENAI_API_KEY,
     ANTHROPIC_API_KEY,
+    BATCH_POLL_INTERVAL,
+    LLM_CIRCUIT_COOLDOWN,
+    LLM_CIRCUIT_THRESHOLD,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_INITIAL_DELAY,
+    LLM_RETRY_MAX_DELAY,
     GROQ_API_KEY,
 )
+from llm_cache import LLMCache
+
+
+# SDK errors worth retrying; the openai, anthropic and groq SDKs share these names
+_TRANSIENT_ERRORS = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504, 529}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a provider is skipped after too many consecutive failures."""
+    pass
+
+
+def _is_transient(error: Exception) -> bool:
+    return (
+        type(error).__name__ in _TRANSIENT_ERRORS
+        or getattr(error, "status_code", None) in _TRANSIENT_STATUS
+    )
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter, in seconds."""
+    return min(LLM_RETRY_MAX_DELAY, LLM_RETRY_INITIAL_DELAY * 2 ** attempt + random.uniform(0, 1))
 
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
     
+    # Sampling settings shared by all providers
+    temperature = 0.2
+    max_tokens = 4000
+    
+    # Circuit breaker state (set per instance on first failure)
+    _consecutive_failures = 0
+    _circuit_open_until = 0.0
+    
     @abstractmethod
     def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """Generate a response from the LLM."""
         pass
     
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """
+        Async variant of generate. Providers with a native async client
+        override this; the default runs generate in a worker thread.
+        """
+        return await asyncio.to_thread(self.generate, prompt, system_prompt)
+    
+    def generate_cached(self, header: str, body: str, system_prompt: Optional[str] = None) -> str:
+        """
+        Generate from a prompt split into a `header` (task instructions +
+        code context, repeated by follow-up requests over the same code)
+        followed by the variable `body`. OpenAI and Groq cache matching
+        prompt prefixes of 1024+ tokens automatically, so the default sends
+        header + body; providers with explicit cache markers override this.
+        """
+        return self.generate(header + body, system_prompt)
+    
+    async def agenerate_cached(self, header: str, body: str, system_prompt: Optional[str] = None) -> str:
+        """Async variant of generate_cached."""
+        return await self.agenerate(header + body, system_prompt)
+    
+    def generate_stream(self, prompt: str, system_prompt: Optional[str] = None) -> Iterator[str]:
+        """
+        Yield the response in pieces as the model produces them. Providers
+        with a streaming API override this; the default yields it whole.
+        """
+        yield self.generate(prompt, system_prompt)
+    
+    def generate_stream_cached(self, header: str, body: str, system_prompt: Optional[str] = None) -> Iterator[str]:
+        """Streaming variant of generate_cached."""
+        yield from self.generate_stream(header + body, system_prompt)
+    
+    def generate_batch(self, items: list[tuple[str, Optional[str]]]) -> list[str]:
+        """
+        Generate responses for many (prompt, system_prompt) pairs where latency
+        does not matter. Providers with a discounted batch API override this;
+        the default just calls generate for each item.
+        """
+        return [self.generate(prompt, system_prompt) for prompt, system_prompt in items]
+    
     @property
     @abstractmethod
     def model_name(self) -> str:
         """Return the model name being used."""
         pass
+    
+    def _check_circuit(self):
+        """Raise CircuitOpenError while the provider is cooling down."""
+        if time.monotonic() < self._circuit_open_until:
+            raise CircuitOpenError(
+                f"{self.model_name} skipped after {self._consecutive_failures} consecutive failures"
+            )
+    
+    def _record_failure(self):
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= LLM_CIRCUIT_THRESHOLD:
+            self._circuit_open_until = time.monotonic() + LLM_CIRCUIT_COOLDOWN
+    
+    def _record_success(self):
+        self._consecutive_failures = 0
+        self._circuit_open_until = 0.0
+    
+    def call_with_retry(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Call fn(*args), retrying transient errors (rate limits, timeouts,
+        5xx) with exponential backoff. Raises CircuitOpenError instead of
+        waiting further once the circuit breaker trips. The SDK clients are
+        built with max_retries=0, so this is the only retry layer.
+        """
+        self._check_circuit()
+        for attempt in range(LLM_MAX_RETRIES):
+            try:
+                result = fn(*args)
+            except Exception as e:
+                if not _is_transient(e):
+                    raise
+                self._record_failure()
+                try:
+                    self._check_circuit()
+                except CircuitOpenError as circuit_error:
+                    raise circuit_error from e
+                if attempt == LLM_MAX_RETRIES - 1:
+                    raise
+                time.sleep(_backoff_delay(attempt))
+            else:
+                self._record_success()
+                return result
+    
+    async def acall_with_retry(self, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Async variant of call_with_retry."""
+        self._check_circuit()
+        for attempt in range(LLM_MAX_RETRIES):
+            try:
+                result = await fn(*args)
+            except Exception as e:
+                if not _is_transient(e):
+                    raise
+                self._record_failure()
+                try:
+                    self._check_circuit()
+                except CircuitOpenError as circuit_error:
+                    raise circuit_error from e
+                if attempt == LLM_MAX_RETRIES - 1:
+                    raise
+                await asyncio.sleep(_backoff_delay(attempt))
+            else:
+                self._record_success()
+                return result
+    
+    @staticmethod
+    def _http_client(asynchronous: bool = False):
+        """
+        Keep-alive connection pool handed to the SDK clients so repeated calls
+        skip the TCP/TLS handshake. Uses HTTP/2 when the h2 package is installed.
+        """
+        import httpx
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        
+        client_cls = httpx.AsyncClient if asynchronous else httpx.Client
+        return client_cls(
+            http2=http2,
+            timeout=LLM_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+                max_connections=LLM_MAX_CONNECTIONS,
+            ),
+        )
+    
+    def close(self):
+        """Close the sync client's connection pool."""
+        if getattr(self, "client", None) is not None:
+            self.client.close()
+            self.client = None
+    
+    async def aclose(self):
+        """Close the async client's connection pool (on the loop that used it)."""
+        if getattr(self, "async_client", None) is not None:
+            await self.async_client.close()
+            self.async_client = None
+
+
+def _first_chunk(
+    provider: LLMProvider,
+    header: str,
+    body: str,
+    system_prompt: Optional[str]
+) -> tuple[Iterator[str], Optional[str]]:
+    """Open provider's stream and read its first piece, so connection errors surface here."""
+    stream = provider.generate_stream_cached(header, body, system_prompt)
+    return stream, next(stream, None)
+
+
+class _ChatCompletionMixin:
+    """Shared request building for providers using the chat-completions API."""
+    
+    @staticmethod
+    def _messages(prompt: str, system_prompt: Optional[str] = None) -> list[dict]:
+        if system_prompt:
+            return [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ]
+        return [{"role": "user", "content": prompt}]
 
 
-class OpenAIProvider(LLMProvider):
+class OpenAIProvider(_ChatCompletionMixin, LLMProvider):
     """OpenAI GPT provider."""
     
     def __init__(self, api_key: str = "", model: str = ""):
         self.api_key = api_key or OPENAI_API_KEY
         self._model = model or LLM_MODELS.get("openai", "gpt-4o-mini")
         self.client = None
+        self.async_client = None
         
     def _ensure_client(self):
         if self.client is None:
             try:
                 from openai import OpenAI
-                self.client = OpenAI(api_key=self.api_key)
+                self.client = OpenAI(api_key=self.api_key, http_client=self._http_client(), max_retries=0)
+            except ImportError:
+                raise ImportError("Please install openai: pip install openai")
+    
+    def _ensure_async_client(self):
+        if self.async_client is None:
+            try:
+                from openai import AsyncOpenAI
+                self.async_client = AsyncOpenAI(api_key=self.api_key, http_client=self._http_client(asynchronous=True), max_retries=0)
             except ImportError:
                 raise ImportError("Please install openai: pip install openai")
     
@@ -53,19 +271,92 @@ class OpenAIProvider(LLMProvider):
     def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         self._ensure_client()
         
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
-        
         response = self.client.chat.completions.create(
             model=self._model,
-            messages=messages,
-            temperature=0.2,
-            max_tokens=4000,
+            messages=self._messages(prompt, system_prompt),
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
         )
         
         return response.choices[0].message.content
+    
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        self._ensure_async_client()
+        
+        response = await self.async_client.chat.completions.create(
+            model=self._model,
+            messages=self._messages(prompt, system_prompt),
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+        
+        return response.choices[0].message.content
+    
+    def generate_stream(self, prompt: str, system_prompt: Optional[str] = None) -> Iterator[str]:
+        self._ensure_client()
+        
+        stream = self.client.chat.completions.create(
+            model=self._model,
+            messages=self._messages(prompt, system_prompt),
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True,
+        )
+        
+        for event in stream:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+    
+    def generate_batch(self, items: list[tuple[str, Optional[str]]]) -> list[str]:
+        """
+        Run many requests through the OpenAI Batch API (half price, completes
+        within 24h). Blocks, polling every BATCH_POLL_INTERVAL seconds.
+        """
+        self._ensure_client()
+        
+        lines = []
+        for i, (prompt, system_prompt) in enumerate(items):
+            lines.append(json.dumps({
+                "custom_id": f"req-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self._model,
+                    "messages": self._messages(prompt, system_prompt),
+                    "temperature": self.temperature,
+                    "max_tokens": self.max_tokens,
+                },
+            }))
+        
+        batch_file = self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        print(f"📦 Submitted OpenAI batch {batch.id} ({len(items)} requests)")
+        
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(BATCH_POLL_INTERVAL)
+            batch = self.client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"OpenAI batch {batch.id} ended with status: {batch.status}")
+        
+        responses = {}
+        output = self.client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                responses[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        
+        return _ordered_batch_results(responses, len(items))
 
 
 class AnthropicProvider(LLMProvider):
@@ -75,12 +366,21 @@ class AnthropicProvider(LLMProvider):
         self.api_key = api_key or ANTHROPIC_API_KEY
         self._model = model or LLM_MODELS.get("anthropic", "claude-3-haiku-20240307")
         self.client = None
+        self.async_client = None
     
     def _ensure_client(self):
         if self.client is None:
             try:
                 import anthropic
-                self.client = anthropic.Anthropic(api_key=self.api_key)
+                self.client = anthropic.Anthropic(api_key=self.api_key, http_client=self._http_client(), max_retries=0)
+            except ImportError:
+                raise ImportError("Please install anthropic: pip install anthropic")
+    
+    def _ensure_async_client(self):
+        if self.async_client is None:
+            try:
+                import anthropic
+                self.async_client = anthropic.AsyncAnthropic(api_key=self.api_key, http_client=self._http_client(asynchronous=True), max_retries=0)
             except ImportError:
                 raise ImportError("Please install anthropic: pip install anthropic")
     
@@ -88,36 +388,119 @@ class AnthropicProvider(LLMProvider):
     def model_name(self) -> str:
         return self._model
     
-    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
-        self._ensure_client()
-        
+    def _kwargs(self, content: Union[str, list[dict]], system_prompt: Optional[str]) -> dict:
+        """Messages API request for one user turn (text or content blocks)."""
         kwargs = {
             "model": self._model,
-            "max_tokens": 4000,
-            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": self.max_tokens,
+            "messages": [{"role": "user", "content": content}],
         }
         
         if system_prompt:
             kwargs["system"] = system_prompt
         
-        response = self.client.messages.create(**kwargs)
+        return kwargs
+    
+    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        self._ensure_client()
+        
+        response = self.client.messages.create(**self._kwargs(prompt, system_prompt))
         
         return response.content[0].text
+    
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        self._ensure_async_client()
+        
+        response = await self.async_client.messages.create(**self._kwargs(prompt, system_prompt))
+        
+        return response.content[0].text
+    
+    def _cached_kwargs(self, header: str, body: str, system_prompt: Optional[str]) -> dict:
+        """
+        Request with a cache breakpoint after the header, so the system
+        prompt + instructions + code context prefix is served from
+        Anthropic's prompt cache. Prefixes under the model's minimum
+        (1024 tokens, 2048 for Haiku) are simply not cached.
+        """
+        return self._kwargs([
+            {"type": "text", "text": header, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": body},
+        ], system_prompt)
+    
+    def generate_cached(self, header: str, body: str, system_prompt: Optional[str] = None) -> str:
+        self._ensure_client()
+        response = self.client.messages.create(**self._cached_kwargs(header, body, system_prompt))
+        return response.content[0].text
+    
+    async def agenerate_cached(self, header: str, body: str, system_prompt: Optional[str] = None) -> str:
+        self._ensure_async_client()
+        response = await self.async_client.messages.create(**self._cached_kwargs(header, body, system_prompt))
+        return response.content[0].text
+    
+    def generate_stream_cached(self, header: str, body: str, system_prompt: Optional[str] = None) -> Iterator[str]:
+        self._ensure_client()
+        with self.client.messages.stream(**self._cached_kwargs(header, body, system_prompt)) as stream:
+            yield from stream.text_stream
+    
+    def generate_stream(self, prompt: str, system_prompt: Optional[str] = None) -> Iterator[str]:
+        self._ensure_client()
+        
+        with self.client.messages.stream(**self._kwargs(prompt, system_prompt)) as stream:
+            yield from stream.text_stream
+    
+    def generate_batch(self, items: list[tuple[str, Optional[str]]]) -> list[str]:
+        """
+        Run many requests through the Anthropic Message Batches API (half
+        price). Blocks, polling every BATCH_POLL_INTERVAL seconds. Older SDKs
+        without client.messages.batches fall back to one call per request.
+        """
+        self._ensure_client()
+        batches = getattr(self.client.messages, "batches", None)
+        if batches is None:
+            print("⚠️ anthropic SDK has no Message Batches API; sending requests one by one")
+            return super().generate_batch(items)
+        
+        requests = [
+            {"custom_id": f"req-{i}", "params": self._kwargs(prompt, system_prompt)}
+            for i, (prompt, system_prompt) in enumerate(items)
+        ]
+        batch = batches.create(requests=requests)
+        print(f"📦 Submitted Anthropic batch {batch.id} ({len(items)} requests)")
+        
+        while batch.processing_status != "ended":
+            time.sleep(BATCH_POLL_INTERVAL)
+            batch = batches.retrieve(batch.id)
+        
+        responses = {}
+        for entry in batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                responses[entry.custom_id] = entry.result.message.content[0].text
+        
+        return _ordered_batch_results(responses, len(items))
 
 
-class GroqProvider(LLMProvider):
+class GroqProvider(_ChatCompletionMixin, LLMProvider):
     """Groq (fast inference) provider."""
     
     def __init__(self, api_key: str = "", model: str = ""):
         self.api_key = api_key or GROQ_API_KEY
         self._model = model or LLM_MODELS.get("groq", "llama-3.1-8b-instant")
         self.client = None
+        self.async_client = None
     
     def _ensure_client(self):
         if self.client is None:
             try:
                 from groq import Groq
-                self.client = Groq(api_key=self.api_key)
+                self.client = Groq(api_key=self.api_key, http_client=self._http_client(), max_retries=0)
+            except ImportError:
+                raise ImportError("Please install groq: pip install groq")
+    
+    def _ensure_async_client(self):
+        if self.async_client is None:
+            try:
+                from groq import AsyncGroq
+                self.async_client = AsyncGroq(api_key=self.api_key, http_client=self._http_client(asynchronous=True), max_retries=0)
             except ImportError:
                 raise ImportError("Please install groq: pip install groq")
     
@@ -128,33 +511,70 @@ class GroqProvider(LLMProvider):
     def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         self._ensure_client()
         
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
-        
         response = self.client.chat.completions.create(
             model=self._model,
-            messages=messages,
-            temperature=0.2,
-            max_tokens=4000,
+            messages=self._messages(prompt, system_prompt),
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
         )
         
         return response.choices[0].message.content
+    
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        self._ensure_async_client()
+        
+        response = await self.async_client.chat.completions.create(
+            model=self._model,
+            messages=self._messages(prompt, system_prompt),
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+        
+        return response.choices[0].message.content
+    
+    def generate_stream(self, prompt: str, system_prompt: Optional[str] = None) -> Iterator[str]:
+        self._ensure_client()
+        
+        stream = self.client.chat.completions.create(
+            model=self._model,
+            messages=self._messages(prompt, system_prompt),
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True,
+        )
+        
+        for event in stream:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+
+
+def _ordered_batch_results(responses: dict[str, str], count: int) -> list[str]:
+    """Order batch responses by their "req-{i}" custom_id; fail if any are missing."""
+    missing = [i for i in range(count) if f"req-{i}" not in responses]
+    if missing:
+        raise RuntimeError(f"{len(missing)}/{count} batch requests failed (first: req-{missing[0]})")
+    return [responses[f"req-{i}"] for i in range(count)]
 
 
 def get_llm_provider(provider_name: Optional[str] = None) -> LLMProvider:
     """
     Factory function to get the appropriate LLM provider.
     
+    Providers are memoized per name, so every caller shares one instance
+    (and its SDK clients and connection pools). Keep per-call state in
+    method arguments, not on the provider.
+    
     Args:
         provider_name: "openai", "anthropic", or "groq"
         
     Returns:
         LLMProvider instance
     """
-    name = (provider_name or LLM_PROVIDER).lower()
-    
+    return _get_provider((provider_name or LLM_PROVIDER).lower())
+
+
+@functools.lru_cache(maxsize=8)
+def _get_provider(name: str) -> LLMProvider:
     providers = {
         "openai": OpenAIProvider,
         "anthropic": AnthropicProvider,
@@ -167,6 +587,27 @@ def get_llm_provider(provider_name: Optional[str] = None) -> LLMProvider:
     return providers[name]()
 
 
+def _warm_sdk_import():
+    """
+    Import the configured provider's SDK at module load when its API key is
+    set, so the first request doesn't pay the import time.
+    """
+    module, api_key = {
+        "openai": ("openai", OPENAI_API_KEY),
+        "anthropic": ("anthropic", ANTHROPIC_API_KEY),
+        "groq": ("groq", GROQ_API_KEY),
+    }.get(LLM_PROVIDER.lower(), ("", ""))
+    
+    if module and api_key:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass  # _ensure_client reports the missing package on first use
+
+
+_warm_sdk_import()
+
+
 class LLM:
     """
     Main LLM interface for the coding agent.
@@ -183,10 +624,202 @@ When suggesting fixes:
 
 Be concise but thorough. Focus on the specific task at hand."""
     
-    def __init__(self, provider: Optional[LLMProvider] = None):
+    # Task instructions and then the code context go before the request, so
+    # follow-ups over the same code share a prefix long enough to be cached
+    ANALYZE_HEADER = """## Instructions
+
+Analyze the code below and respond to the user's request.
+If suggesting code changes, show them in a clear diff format.
+
+"""
+    
+    FIX_HEADER = """## Task
+
+For the problem and code below:
+1. Identify the root cause of the issue
+2. Explain why this is happening
+3. Provide the exact fix in diff format
+4. Note any potential side effects of the fix
+
+"""
+    
+    PATCH_SYSTEM_PROMPT = """You are a code patching assistant. 
+Output ONLY the changes in unified diff format.
+Do not include explanations outside the diff."""
+    
+    PATCH_HEADER = """Generate a patch for the request below.
+Output the changes as a unified diff (--- a/file, +++ b/file format).
+
+"""
+    
+    def __init__(
+        self,
+        provider: Optional[LLMProvider] = None,
+        cache: Optional[LLMCache] = None,
+        fallback_provider: Optional[LLMProvider] = None
+    ):
         self.provider = provider or get_llm_provider()
+        self.cache = cache
+        self.fallback_provider = fallback_provider
         print(f"🤖 Using LLM: {self.provider.model_name}")
     
+    def close(self):
+        """Close the connection pools of the primary and fallback providers."""
+        self.provider.close()
+        if self.fallback_provider is not None and self.fallback_provider is not self.provider:
+            self.fallback_provider.close()
+    
+    def _complete(self, header: str, body: str, system_prompt: str) -> str:
+        """
+        Provider call with retries; while the primary provider's circuit
+        is open, the request goes to the fallback provider (if any).
+        """
+        try:
+            return self.provider.call_with_retry(self.provider.generate_cached, header, body, system_prompt)
+        except CircuitOpenError as e:
+            if self.fallback_provider is None:
+                raise
+            print(f"⚠️ {e}; falling back to {self.fallback_provider.model_name}")
+            return self.fallback_provider.call_with_retry(
+                self.fallback_provider.generate_cached, header, body, system_prompt
+            )
+    
+    async def _acomplete(self, header: str, body: str, system_prompt: str) -> str:
+        """Async variant of _complete."""
+        try:
+            return await self.provider.acall_with_retry(self.provider.agenerate_cached, header, body, system_prompt)
+        except CircuitOpenError as e:
+            if self.fallback_provider is None:
+                raise
+            print(f"⚠️ {e}; falling back to {self.fallback_provider.model_name}")
+            return await self.fallback_provider.acall_with_retry(
+                self.fallback_provider.agenerate_cached, header, body, system_prompt
+            )
+    
+    def _open_stream(self, header: str, body: str, system_prompt: str) -> Iterator[str]:
+        """
+        Streaming variant of _complete: opening the stream (up to its first
+        piece) is retried and falls back like a regular request; errors
+        after that surface to the caller.
+        """
+        try:
+            stream, first = self.provider.call_with_retry(_first_chunk, self.provider, header, body, system_prompt)
+        except CircuitOpenError as e:
+            if self.fallback_provider is None:
+                raise
+            print(f"⚠️ {e}; falling back to {self.fallback_provider.model_name}")
+            stream, first = self.fallback_provider.call_with_retry(
+                _first_chunk, self.fallback_provider, header, body, system_prompt
+            )
+        
+        if first is not None:
+            yield first
+        yield from stream
+    
+    def _scope(self, task: str, system_prompt: str, code_context: str) -> dict:
+        """Everything besides the user's request that determines a response."""
+        return {
+            "model": self.provider.model_name,
+            "system": system_prompt,
+            "task": task,
+            "context": code_context,
+            "temperature": self.provider.temperature,
+            "max_tokens": self.provider.max_tokens,
+        }
+    
+    def _generate(
+        self,
+        task: str,
+        code_context: str,
+        query: str,
+        header: str,
+        body: str,
+        system_prompt: str
+    ) -> str:
+        """Call the provider, going through the response cache if configured."""
+        if self.cache is None:
+            return self._complete(header, body, system_prompt)
+        
+        return self.cache.get_or_compute(
+            self._scope(task, system_prompt, code_context),
+            query,
+            lambda: self._complete(header, body, system_prompt)
+        )
+    
+    async def _agenerate(
+        self,
+        task: str,
+        code_context: str,
+        query: str,
+        header: str,
+        body: str,
+        system_prompt: str
+    ) -> str:
+        """Async variant of _generate."""
+        if self.cache is None:
+            return await self._acomplete(header, body, system_prompt)
+        
+        scope = self._scope(task, system_prompt, code_context)
+        cached = self.cache.lookup(scope, query)
+        if cached is not None:
+            print("⚡ Reusing cached LLM response")
+            return cached
+        
+        response = await self._acomplete(header, body, system_prompt)
+        self.cache.store(scope, query, response)
+        return response
+    
+    def _generate_stream(
+        self,
+        task: str,
+        code_context: str,
+        query: str,
+        header: str,
+        body: str,
+        system_prompt: str
+    ) -> Iterator[str]:
+        """Streaming variant of _generate; a cached response is yielded whole."""
+        if self.cache is None:
+            yield from self._open_stream(header, body, system_prompt)
+            return
+        
+        scope = self._scope(task, system_prompt, code_context)
+        cached = self.cache.lookup(scope, query)
+        if cached is not None:
+            print("⚡ Reusing cached LLM response")
+            yield cached
+            return
+        
+        parts = []
+        for text in self._open_stream(header, body, system_prompt):
+            parts.append(text)
+            yield text
+        self.cache.store(scope, query, "".join(parts))
+    
+    def _analyze_prompt(self, code_context: str, user_prompt: str) -> tuple[str, str]:
+        """(cacheable header, request body) for analyze_code."""
+        header = f"""{self.ANALYZE_HEADER}## Relevant Code from Repository
+
+{code_context}
+
+"""
+        return header, f"""## User Request
+
+{user_prompt}
+"""
+    
+    def _fix_prompt(self, code_context: str, issue_description: str) -> tuple[str, str]:
+        """(cacheable header, request body) for suggest_fix."""
+        header = f"""{self.FIX_HEADER}## Relevant Code
+
+{code_context}
+
+"""
+        return header, f"""## Problem
+
+{issue_description}
+"""
+    
     def analyze_code(self, code_context: str, user_prompt: str) -> str:
         """
         Analyze code and respond to user's request.
@@ -198,21 +831,42 @@ Be concise but thorough. Focus on the specific task at hand."""
         Returns:
             LLM's analysis and suggestions
         """
-        prompt = f"""## Relevant Code from Repository
-
-{code_context}
-
-## User Request
-
-{user_prompt}
-
-## Instructions
-
-Analyze the code above and respond to the user's request.
-If suggesting code changes, show them in a clear diff format.
-"""
+        header, body = self._analyze_prompt(code_context, user_prompt)
+        return self._generate("analyze", code_context, user_prompt, header, body, self.SYSTEM_PROMPT)
+    
+    def analyze_code_stream(self, code_context: str, user_prompt: str) -> Iterator[str]:
+        """Streaming variant of analyze_code: yields text as it is generated."""
+        header, body = self._analyze_prompt(code_context, user_prompt)
+        yield from self._generate_stream("analyze", code_context, user_prompt, header, body, self.SYSTEM_PROMPT)
+    
+    async def aanalyze_code(self, code_context: str, user_prompt: str) -> str:
+        """Async variant of analyze_code."""
+        header, body = self._analyze_prompt(code_context, user_prompt)
+        return await self._agenerate("analyze", code_context, user_prompt, header, body, self.SYSTEM_PROMPT)
+    
+    async def aanalyze_many(
+        self,
+        items: list[tuple[str, str]],
+        max_concurrency: int = LLM_MAX_CONCURRENCY
+    ) -> list[str]:
+        """
+        Run aanalyze_code for several (code_context, user_prompt) pairs
+        concurrently, each going through the response cache and retries.
+        
+        Args:
+            items: (code_context, user_prompt) pairs
+            max_concurrency: Max requests in flight at once (provider rate limits)
+            
+        Returns:
+            Responses in the same order as items
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def one(code_context: str, user_prompt: str) -> str:
+            async with semaphore:
+                return await self.aanalyze_code(code_context, user_prompt)
         
-        return self.provider.generate(prompt, self.SYSTEM_PROMPT)
+        return await asyncio.gather(*(one(*item) for item in items))
     
     def suggest_fix(self, code_context: str, issue_description: str) -> str:
         """
@@ -225,23 +879,13 @@ If suggesting code changes, show them in a clear diff format.
         Returns:
             Suggested fix with explanation
         """
-        prompt = f"""## Problem
-
-{issue_description}
-
-## Relevant Code
-
-{code_context}
-
-## Task
-
-1. Identify the root cause of the issue
-2. Explain why this is happening
-3. Provide the exact fix in diff format
-4. Note any potential side effects of the fix
-"""
-        
-        return self.provider.generate(prompt, self.SYSTEM_PROMPT)
+        header, body = self._fix_prompt(code_context, issue_description)
+        return self._generate("fix", code_context, issue_description, header, body, self.SYSTEM_PROMPT)
+    
+    async def asuggest_fix(self, code_context: str, issue_description: str) -> str:
+        """Async variant of suggest_fix."""
+        header, body = self._fix_prompt(code_context, issue_description)
+        return await self._agenerate("fix", code_context, issue_description, header, body, self.SYSTEM_PROMPT)
     
     def generate_patch(self, code_context: str, instructions: str) -> str:
         """
@@ -254,24 +898,17 @@ If suggesting code changes, show them in a clear diff format.
         Returns:
             Unified diff format patch
         """
-        patch_prompt = """You are a code patching assistant. 
-Output ONLY the changes in unified diff format.
-Do not include explanations outside the diff."""
-        
-        prompt = f"""Generate a patch for the following request.
-
-## Current Code
+        header = f"""{self.PATCH_HEADER}## Current Code
 
 {code_context}
 
-## Requested Changes
+"""
+        body = f"""## Requested Changes
 
 {instructions}
-
-Output the changes as a unified diff (--- a/file, +++ b/file format).
 """
         
-        return self.provider.generate(prompt, patch_prompt)
+        return self._generate("patch", code_context, instructions, header, body, self.PATCH_SYSTEM_PROMPT)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+"""
+LLM response cache.
+
+Avoids repeat LLM round-trips for identical or near-identical requests.
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from config import RESPONSE_CACHE_DIR, RESPONSE_CACHE_THRESHOLD
+
+
+class LLMCache:
+    """
+    Two-tier cache of LLM responses, persisted to disk.
+    
+    A request is split into a `scope` (model, system prompt, task, code
+    context, sampling settings) and a free-text `query` (the user's request).
+    
+    - Exact: sha256(scope + query) -> response text, one file per entry.
+    - Semantic: on an exact miss, reuse a response from the same scope whose
+      query embedding has cosine similarity >= threshold with the new query.
+    """
+    
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        embed_fn: Optional[Callable[[str], np.ndarray]] = None
+    ):
+        self.cache_dir = Path(cache_dir or RESPONSE_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.embed_fn = embed_fn  # Normalized text embedding; None disables semantic hits
+        
+        self._semantic_path = self.cache_dir / "semantic.npz"
+        self._keys: list[str] = []
+        self._scopes: list[str] = []
+        self._embeddings: Optional[np.ndarray] = None
+        self._load_semantic()
+    
+    @staticmethod
+    def _hash(data: dict) -> str:
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+    
+    def lookup(self, scope: dict, query: str) -> Optional[str]:
+        """
+        Return a cached response for (scope, query): exact match first, then
+        the most similar query cached under the same scope.
+        """
+        cached = self._read(self._hash({"scope": scope, "query": query}))
+        if cached is not None or self.embed_fn is None or not self._keys:
+            return cached
+        
+        scope_key = self._hash(scope)
+        rows = [i for i, s in enumerate(self._scopes) if s == scope_key]
+        if not rows:
+            return None
+        
+        similarities = self._embeddings[rows] @ self.embed_fn(query).astype(np.float32)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self._read(self._keys[rows[best]])
+    
+    def store(self, scope: dict, query: str, response: str):
+        """Cache a response for (scope, query)."""
+        key = self._hash({"scope": scope, "query": query})
+        tmp_path = self.cache_dir / f"{key}.txt.tmp"
+        tmp_path.write_text(response, encoding="utf-8")
+        tmp_path.replace(self.cache_dir / f"{key}.txt")
+        
+        if self.embed_fn is not None and key not in self._keys:
+            row = self.embed_fn(query).astype(np.float32)[None, :]
+            if self._embeddings is None:
+                self._embeddings = row
+            else:
+                self._embeddings = np.concatenate([self._embeddings, row])
+            self._keys.append(key)
+            self._scopes.append(self._hash(scope))
+            self._save_semantic()
+    
+    def get_or_compute(self, scope: dict, query: str, compute: Callable[[], str]) -> str:
+        """
+        Return the cached response for (scope, query), or call `compute`
+        and cache its result.
+        """
+        cached = self.lookup(scope, query)
+        if cached is not None:
+            print("⚡ Reusing cached LLM response")
+            return cached
+        
+        response = compute()
+        self.store(scope, query, response)
+        return response
+    
+    def _read(self, key: str) -> Optional[str]:
+        try:
+            return (self.cache_dir / f"{key}.txt").read_text(encoding="utf-8")
+        except OSError:
+            return None
+    
+    def _load_semantic(self):
+        """Load the semantic index (query embeddings, keys, scopes) from disk."""
+        if not self._semantic_path.exists():
+            return
+        try:
+            with np.load(self._semantic_path) as data:
+                self._embeddings = data["embeddings"]
+                self._keys = data["keys"].tolist()
+                self._scopes = data["scopes"].tolist()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable response cache index: {e}")
+            self._embeddings, self._keys, self._scopes = None, [], []
+    
+    def _save_semantic(self):
+        """Persist the semantic index."""
+        tmp_path = self.cache_dir / "semantic.npz.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                embeddings=self._embeddings,
+                keys=np.array(self._keys, dtype=str),
+                scopes=np.array(self._scopes, dtype=str),
+            )
+        tmp_path.replace(self._semantic_path)
@@ -3,12 +3,14 @@ Semantic retrieval module.
 
 STEP 4: Find relevant code chunks for a given prompt.
 """
+import asyncio
+import io
 from typing import Optional
 
-from config import TOP_K_CHUNKS
-from embed import VectorStore
+from config import SIMHASH_MAX_DISTANCE, TOP_K_CHUNKS
+from embed import ChunkTable, VectorStore
 from ingest import CodeChunk
-from tools import format_file_for_context, estimate_tokens
+from tools import format_file_for_context, estimate_tokens, fingerprint, simhash
 
 
 class CodeRetriever:
@@ -19,10 +21,31 @@ class CodeRetriever:
     
     def __init__(self, store: Optional[VectorStore] = None):
         self.store = store or VectorStore()
+        # file_path -> chunk rows sorted by start line, for get_file_context
+        self._by_file: dict[str, list[int]] = {}
+        self._by_file_source = None
     
     def load_index(self, name: str = "default") -> bool:
         """Load a pre-built index."""
-        return self.store.load(name)
+        if not self.store.load(name):
+            return False
+        self._file_rows()
+        return True
+    
+    def _file_rows(self) -> dict[str, list[int]]:
+        """Return the file map, rebuilding it if the store's chunks were replaced."""
+        chunks = self.store.chunks
+        if self._by_file_source is not chunks:
+            if isinstance(chunks, ChunkTable):
+                self._by_file = chunks.rows_by_file()
+            else:
+                self._by_file = {}
+                for i, chunk in enumerate(chunks):
+                    self._by_file.setdefault(chunk.file_path, []).append(i)
+                for rows in self._by_file.values():
+                    rows.sort(key=lambda i: chunks[i].start_line)
+            self._by_file_source = chunks
+        return self._by_file
     
     def retrieve(
         self,
@@ -43,21 +66,55 @@ class CodeRetriever:
         """
         # Get raw results
         results = self.store.search(query, top_k=top_k * 2)  # Get extra for filtering
+        return self._filter_results(results, top_k, max_tokens)
+    
+    def retrieve_many(
+        self,
+        queries: list[str],
+        top_k: int = TOP_K_CHUNKS,
+        max_tokens: int = 8000
+    ) -> list[list[tuple[CodeChunk, float]]]:
+        """
+        Retrieve relevant chunks for several queries with one batched search.
         
-        # Filter and deduplicate
-        seen_content = set()
+        Args:
+            queries: User prompts/questions
+            top_k: Maximum number of chunks to retrieve per query
+            max_tokens: Approximate token budget for each query's context
+            
+        Returns:
+            One list of (chunk, score) tuples per query
+        """
+        all_results = self.store.search_batch(queries, top_k=top_k * 2)  # Get extra for filtering
+        return [self._filter_results(results, top_k, max_tokens) for results in all_results]
+    
+    def _filter_results(
+        self,
+        results: list[tuple[CodeChunk, float]],
+        top_k: int,
+        max_tokens: int
+    ) -> list[tuple[CodeChunk, float]]:
+        """Deduplicate raw search results and fit them to the token budget."""
+        seen_fingerprints = set()
+        seen_signatures = []
         filtered_results = []
         total_tokens = 0
         
         for chunk, score in results:
-            # Skip near-duplicates
-            content_hash = hash(chunk.content[:500])
-            if content_hash in seen_content:
+            # Skip exact duplicates: one set lookup on the precomputed fingerprint
+            fp = chunk.fingerprint if chunk.fingerprint is not None else fingerprint(chunk.content)
+            if fp in seen_fingerprints:
                 continue
-            seen_content.add(content_hash)
+            seen_fingerprints.add(fp)
+            
+            # Skip near-duplicates (results are best-first, so the best copy is kept)
+            signature = chunk.simhash if chunk.simhash is not None else simhash(chunk.content)
+            if any((signature ^ seen).bit_count() <= SIMHASH_MAX_DISTANCE for seen in seen_signatures):
+                continue
+            seen_signatures.append(signature)
             
             # Check token budget
-            chunk_tokens = estimate_tokens(chunk.content)
+            chunk_tokens = chunk.token_count if chunk.token_count is not None else estimate_tokens(chunk.content)
             if total_tokens + chunk_tokens > max_tokens:
                 continue
             
@@ -87,20 +144,49 @@ class CodeRetriever:
             Formatted string for LLM context
         """
         results = self.retrieve(query, top_k, max_tokens)
+        return self.format_context(results)
+    
+    def format_context(self, results: list[tuple[CodeChunk, float]]) -> str:
+        """
+        Format retrieved chunks as LLM context.
         
+        Args:
+            results: (chunk, score) tuples from retrieve
+            
+        Returns:
+            Formatted string for LLM context
+        """
         if not results:
             return "No relevant code found in the repository."
         
-        context_parts = [
-            "Here are the most relevant code sections from the repository:\n"
-        ]
+        buf = io.StringIO()
+        buf.write("Here are the most relevant code sections from the repository:\n")
         
         for i, (chunk, score) in enumerate(results, 1):
             location = f"{chunk.file_path}:{chunk.start_line}-{chunk.end_line}"
-            context_parts.append(f"\n--- [{i}] {location} (relevance: {score:.2f}) ---\n")
-            context_parts.append(f"```\n{chunk.content}\n```\n")
+            buf.write(f"\n\n--- [{i}] {location} (relevance: {score:.2f}) ---\n\n```\n")
+            buf.write(chunk.content)
+            buf.write("\n```\n")
         
-        return "\n".join(context_parts)
+        return buf.getvalue()
+    
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: int = TOP_K_CHUNKS,
+        max_tokens: int = 8000
+    ) -> list[tuple[CodeChunk, float]]:
+        """Async variant of retrieve; runs the embedding + search in a worker thread."""
+        return await asyncio.to_thread(self.retrieve, query, top_k, max_tokens)
+    
+    async def aretrieve_as_context(
+        self,
+        query: str,
+        top_k: int = TOP_K_CHUNKS,
+        max_tokens: int = 8000
+    ) -> str:
+        """Async variant of retrieve_as_context."""
+        return await asyncio.to_thread(self.retrieve_as_context, query, top_k, max_tokens)
     
     def get_file_context(self, file_path: str) -> Optional[str]:
         """
@@ -112,30 +198,28 @@ class CodeRetriever:
         Returns:
             Combined content of all chunks from that file
         """
-        matching_chunks = [
-            chunk for chunk in self.store.chunks
-            if chunk.file_path == file_path
-        ]
-        
-        if not matching_chunks:
+        rows = self._file_rows().get(file_path)
+        if not rows:
             return None
         
-        # Sort by line number and combine
-        matching_chunks.sort(key=lambda c: c.start_line)
-        
-        # Avoid duplicating overlapping content
+        # Rows are already sorted by line number; combine them
+        # while avoiding duplicated overlapping content
         combined = []
         last_end = 0
         
-        for chunk in matching_chunks:
+        for i in rows:
+            chunk = self.store.chunks[i]
             if chunk.start_line > last_end:
                 combined.append(chunk.content)
             elif chunk.end_line > last_end:
-                # Partial overlap - get only new lines
-                lines = chunk.content.split("\n")
-                new_start = last_end - chunk.start_line + 1
-                if new_start < len(lines):
-                    combined.append("\n".join(lines[new_start:]))
+                # Partial overlap - skip past the already-included lines
+                pos = 0
+                for _ in range(last_end - chunk.start_line + 1):
+                    pos = chunk.content.find("\n", pos) + 1
+                    if pos == 0:
+                        break
+                if pos:
+                    combined.append(chunk.content[pos:])
             last_end = max(last_end, chunk.end_line)
         
         return "\n".join(combined)
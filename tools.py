@@ -1,17 +1,39 @@
 """
 Filesystem and utility helpers for the Mini Coding Agent.
 """
+import hashlib
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+
+import numpy as np
 
 from config import IGNORE_DIRS, SUPPORTED_EXTENSIONS, MAX_FILE_SIZE
 
+try:
+    import charset_normalizer
+except ImportError:
+    charset_normalizer = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Loaded on first use: get_encoding() may download the BPE file, which must
+# not make importing this module fail when the machine is offline.
+_TOKEN_ENCODING = None
+_TOKEN_ENCODING_LOADED = False
+
 
 def should_ignore_path(path: Path) -> bool:
     """Check if a path should be ignored based on directory rules."""
-    parts = path.parts
-    return any(ignore_dir in parts for ignore_dir in IGNORE_DIRS)
+    return not IGNORE_DIRS.isdisjoint(path.parts)
 
 
 def is_supported_file(path: Path) -> bool:
@@ -27,24 +49,75 @@ def is_file_too_large(path: Path) -> bool:
         return True
 
 
+def scan_repo(root: Path) -> Iterator[tuple[Path, int]]:
+    """
+    Recursively yield (path, size) for supported files under root, skipping
+    ignored directories and files over MAX_FILE_SIZE. Uses os.scandir so
+    type and size checks reuse the cached directory entry.
+    """
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name not in IGNORE_DIRS:
+                yield from scan_repo(entry.path)
+            continue
+        
+        if not entry.is_file():
+            continue
+        if os.path.splitext(entry.name)[1].lower() not in SUPPORTED_EXTENSIONS:
+            continue
+        try:
+            size = entry.stat().st_size
+        except OSError:
+            continue
+        if size > MAX_FILE_SIZE:
+            print(f"Skipping large file: {entry.path}")
+            continue
+        
+        yield Path(entry.path), size
+
+
 def read_file_content(path: Path) -> Optional[str]:
     """
-    Safely read file content with encoding fallback.
+    Safely read file content: a single read, decoded as UTF-8 or, failing
+    that, with the detected charset (or an encoding fallback list).
+    Line endings are normalized to "\n", as text-mode open() would.
     Returns None if file cannot be read.
     """
-    encodings = ["utf-8", "utf-8-sig", "latin-1", "cp1252"]
+    try:
+        data = Path(path).read_bytes()
+    except OSError as e:
+        print(f"Error reading {path}: {e}")
+        return None
     
-    for encoding in encodings:
+    text = _decode_bytes(data)
+    if text is None:
+        print(f"Could not decode {path} with any encoding")
+        return None
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _decode_bytes(data: bytes) -> Optional[str]:
+    """Decode as UTF-8, else the detected charset, else the first fallback encoding that works."""
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    
+    if charset_normalizer is not None:
+        best = charset_normalizer.from_bytes(data).best()
+        if best is not None:
+            return str(best)
+    
+    for encoding in ("utf-8-sig", "latin-1", "cp1252"):
         try:
-            with open(path, "r", encoding=encoding) as f:
-                return f.read()
-        except (UnicodeDecodeError, UnicodeError):
+            return data.decode(encoding)
+        except UnicodeDecodeError:
             continue
-        except (IOError, OSError) as e:
-            print(f"Error reading {path}: {e}")
-            return None
-    
-    print(f"Could not decode {path} with any encoding")
     return None
 
 
@@ -61,12 +134,65 @@ def format_file_for_context(file_path: str, content: str) -> str:
     return f"### File: {file_path}\n```\n{content}\n```\n"
 
 
+def _get_token_encoding():
+    """Load the cl100k_base encoding once; None if unavailable for any reason."""
+    global _TOKEN_ENCODING, _TOKEN_ENCODING_LOADED
+    if not _TOKEN_ENCODING_LOADED:
+        _TOKEN_ENCODING_LOADED = True
+        if tiktoken is not None:
+            try:
+                _TOKEN_ENCODING = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"Could not load tiktoken encoding, estimating tokens: {e}")
+    return _TOKEN_ENCODING
+
+
 def estimate_tokens(text: str) -> int:
     """
-    Rough token estimation (4 chars ≈ 1 token).
-    Used for context window management.
+    Token count for context window management: exact cl100k_base count when
+    tiktoken is installed and its encoding loads, otherwise a rough
+    estimate (4 chars ≈ 1 token).
+    """
+    encoding = _get_token_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def fingerprint(text: str) -> int:
+    """
+    Stable 64-bit hash of the full text, for exact-duplicate checks:
+    xxh3 when xxhash is installed, else BLAKE2b truncated to 8 bytes.
     """
-    return len(text) // 4
+    data = text.encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def simhash(text: str, shingle_size: int = 5) -> int:
+    """
+    64-bit SimHash over word shingles of lowercased text. Splitting on
+    whitespace makes it layout-insensitive; near-duplicate texts (e.g. an
+    edited comment) get signatures only a few bits apart.
+    """
+    tokens = text.lower().split()
+    if not tokens:
+        return 0
+    
+    n = max(len(tokens) - shingle_size + 1, 1)
+    hashes = np.array([
+        int.from_bytes(
+            hashlib.blake2b(" ".join(tokens[i:i + shingle_size]).encode("utf-8"), digest_size=8).digest(),
+            "little"
+        )
+        for i in range(n)
+    ], dtype=np.uint64)
+    
+    # Each bit of the signature is the majority vote of that bit across shingles
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0) * 2 > n
+    return int(np.packbits(votes, bitorder="little").view("<u8")[0])
 
 
 def truncate_content(content: str, max_chars: int = 10000) -> str: